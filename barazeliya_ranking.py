@@ -1,788 +1,3986 @@
-from flask import Flask, render_template, redirect, url_for, session, request, flash
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.sql import func
-from werkzeug.security import generate_password_hash, check_password_hash
-import datetime
-from jinja2 import DictLoader
-
-app = Flask(__name__)
-app.secret_key = 'your_secret_key'  # Replace with a secure secret key
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-db = SQLAlchemy(app)
-
-# User model
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), nullable=False, unique=True)
-    password = db.Column(db.String(200), nullable=False)
-    is_admin = db.Column(db.Boolean, default=False)
-    is_approved = db.Column(db.Boolean, default=False)
-    player = db.relationship('Player', uselist=False, backref='user')
-
-# Player model
-class Player(db.Model):
-    id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
-    rating = db.Column(db.Float, default=1500)
-    games_played = db.Column(db.Integer, default=0)
-
-# Game model with relationships and ELO changes
-class Game(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    team1_player1_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    team1_player2_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    team2_player1_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    team2_player2_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    winning_team = db.Column(db.Integer)
-    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
-    confirmations = db.Column(db.Integer, default=1)
-    status = db.Column(db.String(50), default='draft')
-    processed = db.Column(db.Boolean, default=False)
-    date_submitted = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    # Store ELO changes
-    elo_changes = db.relationship('EloChange', backref='game', cascade='all, delete-orphan')
-
-    # Relationships
-    team1_player1 = db.relationship('User', foreign_keys=[team1_player1_id])
-    team1_player2 = db.relationship('User', foreign_keys=[team1_player2_id])
-    team2_player1 = db.relationship('User', foreign_keys=[team2_player1_id])
-    team2_player2 = db.relationship('User', foreign_keys=[team2_player2_id])
-    submitted_by_user = db.relationship('User', foreign_keys=[submitted_by])
-
-# EloChange model to track ELO changes per player per game
-class EloChange(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    game_id = db.Column(db.Integer, db.ForeignKey('game.id'))
-    player_id = db.Column(db.Integer, db.ForeignKey('player.id'))
-    elo_change = db.Column(db.Float)
-    player = db.relationship('Player')
-
-def create_tables():
-    db.create_all()
-    # Check if admin exists
-    if not User.query.filter_by(username='admin').first():
-        admin_user = User(
-            username='admin',
-            password=generate_password_hash('zz99rash'),
-            is_admin=True,
-            is_approved=True
-        )
-        db.session.add(admin_user)
-        db.session.commit()
-    # Create demo users and games
-    create_demo_data()
-
-def create_demo_data():
-    if User.query.count() > 1:  # Admin already exists
-        return
-    for i in range(1, 11):
-        username = f'player{i}'
-        password = generate_password_hash('123')
-        user = User(username=username, password=password, is_approved=True)
-        db.session.add(user)
-        db.session.commit()
-        player = Player(id=user.id)
-        db.session.add(player)
-        db.session.commit()
-    # Simulate games
-    simulate_games()
-
-def simulate_games():
-    import random
-    users = User.query.filter_by(is_admin=False).all()
-    players = [user.player for user in users]
-    for _ in range(50):
-        match_players = random.sample(players, 4)
-        team1_p1, team1_p2, team2_p1, team2_p2 = match_players
-        winning_team = random.choice([1, 2])
-        game = Game(
-            team1_player1_id=team1_p1.id,
-            team1_player2_id=team1_p2.id,
-            team2_player1_id=team2_p1.id,
-            team2_player2_id=team2_p2.id,
-            winning_team=winning_team,
-            submitted_by=1,  # Admin
-            confirmations=4,
-            status='confirmed',
-            processed=False
-        )
-        db.session.add(game)
-        db.session.commit()
-        process_game(game.id)
-
-# Login Route
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if 'user_id' in session:
-        return redirect(url_for('index'))
-    if request.method == 'POST':
-        username = request.form['username'].strip().lower()
-        password = request.form['password'].strip()
-        user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password, password):
-            if not user.is_approved:
-                flash('Your account is pending admin approval.')
-                return redirect(url_for('login'))
-            session['user_id'] = user.id
-            return redirect(url_for('index'))
-        else:
-            flash('Invalid credentials.')
-    return render_template('login.html')
-
-# Sign Up Route
-@app.route('/signup', methods=['GET', 'POST'])
-def signup():
-    if request.method == 'POST':
-        username = request.form['username'].strip().lower()
-        password = request.form['password'].strip()
-        if User.query.filter_by(username=username).first():
-            flash('Username already exists.')
-            return redirect(url_for('signup'))
-        new_user = User(
-            username=username,
-            password=generate_password_hash(password),
-            is_approved=False
-        )
-        db.session.add(new_user)
-        db.session.commit()
-        flash('Your account is pending admin approval.')
-        return redirect(url_for('login'))
-    return render_template('signup.html')
-
-# Logout Route
-@app.route('/logout')
-def logout():
-    session.pop('user_id', None)
-    flash('You have been logged out.')
-    return redirect(url_for('login'))
-
-# Home Route
-@app.route('/')
-def index():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    user = db.session.get(User, session['user_id'])
-    return render_template('index.html', user=user)
-
-# Submit Game Route (formerly Dashboard)
-@app.route('/dashboard', methods=['GET', 'POST'])
-def dashboard():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    user = db.session.get(User, session['user_id'])
-    if not user.is_approved:
-        flash('Your account is pending admin approval.')
-        return redirect(url_for('index'))
-    if request.method == 'POST':
-        # Handle game submission
-        team1_player1_id = request.form.get('player1')
-        team1_player2_id = request.form.get('player2')
-        team2_player1_id = request.form.get('player3')
-        team2_player2_id = request.form.get('player4')
-        winning_team = request.form.get('winning_team')
-        if not all([team1_player1_id, team1_player2_id, team2_player1_id, team2_player2_id, winning_team]):
-            flash('Please select all players and the winning team.')
-            return redirect(url_for('dashboard'))
-        # Ensure unique players
-        selected_players = {team1_player1_id, team1_player2_id, team2_player1_id, team2_player2_id}
-        if len(selected_players) < 4:
-            flash('Each player must be unique.')
-            return redirect(url_for('dashboard'))
-        winning_team = int(winning_team)
-        game = Game(
-            team1_player1_id=team1_player1_id,
-            team1_player2_id=team1_player2_id,
-            team2_player1_id=team2_player1_id,
-            team2_player2_id=team2_player2_id,
-            winning_team=winning_team,
-            submitted_by=user.id,
-            confirmations=1,
-            status='draft',
-            processed=False
-        )
-        db.session.add(game)
-        db.session.commit()
-        flash('Game submitted and is pending confirmation.')
-        return redirect(url_for('my_games'))
-    players = Player.query.all()
-    return render_template('dashboard.html', user=user, players=players)
-
-# My Games Route
-@app.route('/my_games')
-def my_games():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    user = db.session.get(User, session['user_id'])
-    games = Game.query.filter(
-        (Game.team1_player1_id == user.id) |
-        (Game.team1_player2_id == user.id) |
-        (Game.team2_player1_id == user.id) |
-        (Game.team2_player2_id == user.id)
-    ).order_by(Game.date_submitted.desc()).all()
-    return render_template('my_games.html', user=user, games=games)
-
-# Confirm Game Route
-@app.route('/confirm_game/<int:game_id>')
-def confirm_game(game_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    game = db.session.get(Game, game_id)
-    user = db.session.get(User, session['user_id'])
-    if game.status == 'confirmed':
-        flash('Game already confirmed.')
-        return redirect(url_for('my_games'))
-    # Check if user is part of the game
-    if str(user.id) not in [
-        str(game.team1_player1_id),
-        str(game.team1_player2_id),
-        str(game.team2_player1_id),
-        str(game.team2_player2_id)
-    ]:
-        flash('You are not a participant in this game.')
-        return redirect(url_for('my_games'))
-    game.confirmations += 1
-    if game.confirmations >= 3:
-        game.status = 'confirmed'
-    db.session.commit()
-    if game.status == 'confirmed':
-        process_game(game.id)
-    flash('Game confirmed.')
-    return redirect(url_for('my_games'))
-
-def process_game(game_id):
-    game = db.session.get(Game, game_id)
-    if game.processed:
-        return
-    # Retrieve players
-    team1_players = [
-        db.session.get(Player, game.team1_player1_id),
-        db.session.get(Player, game.team1_player2_id)
-    ]
-    team2_players = [
-        db.session.get(Player, game.team2_player1_id),
-        db.session.get(Player, game.team2_player2_id)
-    ]
-    # Calculate ratings
-    elo_changes = calculate_elo(team1_players, team2_players, game.winning_team)
-    # Update players and record ELO changes
-    for player, elo_change in elo_changes.items():
-        player.rating += elo_change
-        player.games_played += 1
-        # Record ELO change
-        ec = EloChange(game_id=game.id, player_id=player.id, elo_change=elo_change)
-        db.session.add(ec)
-    game.processed = True
-    db.session.commit()
-
-def calculate_elo(team1, team2, winning_team):
-    team1_rating = sum([p.rating for p in team1]) / len(team1)
-    team2_rating = sum([p.rating for p in team2]) / len(team2)
-    expected_score_team1 = 1 / (1 + 10 ** ((team2_rating - team1_rating) / 400))
-    actual_score_team1 = 1 if winning_team == 1 else 0
-    rating_change_team1 = actual_score_team1 - expected_score_team1
-    elo_changes = {}
-    for player in team1:
-        K = get_k_factor(player.rating)
-        delta = K * rating_change_team1
-        elo_changes[player] = delta
-    for player in team2:
-        K = get_k_factor(player.rating)
-        delta = K * (-rating_change_team1)
-        elo_changes[player] = delta
-    return elo_changes
-
-def get_k_factor(rating):
-    if rating >= 2400:
-        return 16
-    elif rating >= 2100:
-        return 24
-    else:
-        return 32
-
-# Leaderboard Route
-@app.route('/leaderboard')
-def leaderboard():
-    players = Player.query.join(User).filter(User.is_approved == True).order_by(Player.rating.desc()).all()
-    return render_template('leaderboard.html', players=players)
-
-# Admin Dashboard Route
-@app.route('/admin_dashboard')
-def admin_dashboard():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    user = db.session.get(User, session['user_id'])
-    if not user.is_admin:
-        return redirect(url_for('index'))
-    pending_users = User.query.filter_by(is_approved=False).all()
-    users = User.query.filter_by(is_approved=True).all()
-    games = Game.query.order_by(Game.date_submitted.desc()).all()
-    return render_template('admin_dashboard.html', user=user, pending_users=pending_users, users=users, games=games)
-
-# Approve User Route
-@app.route('/approve_user/<int:user_id>')
-def approve_user(user_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    admin = db.session.get(User, session['user_id'])
-    if not admin.is_admin:
-        return redirect(url_for('index'))
-    user = db.session.get(User, user_id)
-    user.is_approved = True
-    db.session.commit()
-    # Add to player table
-    player = Player(id=user.id)
-    db.session.add(player)
-    db.session.commit()
-    flash('User approved.')
-    return redirect(url_for('admin_dashboard'))
-
-# Delete User Route
-@app.route('/delete_user/<int:user_id>')
-def delete_user(user_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    admin = db.session.get(User, session['user_id'])
-    if not admin.is_admin or user_id == admin.id:
-        return redirect(url_for('index'))
-    user = db.session.get(User, user_id)
-    player = db.session.get(Player, user_id)
-    if player:
-        db.session.delete(player)
-    db.session.delete(user)
-    db.session.commit()
-    flash('User deleted.')
-    return redirect(url_for('admin_dashboard'))
-
-# Delete Game Route with ELO refund
-@app.route('/delete_game/<int:game_id>')
-def delete_game(game_id):
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    admin = db.session.get(User, session['user_id'])
-    if not admin.is_admin:
-        return redirect(url_for('index'))
-    game = db.session.get(Game, game_id)
-    if game.processed:
-        # Refund ELO changes
-        for elo_change in game.elo_changes:
-            player = db.session.get(Player, elo_change.player_id)
-            player.rating -= elo_change.elo_change
-            player.games_played -= 1
-            db.session.delete(elo_change)
-    db.session.delete(game)
-    db.session.commit()
-    flash('Game deleted and ELO changes refunded.')
-    return redirect(url_for('admin_dashboard'))
-
-# Templates as multi-line strings with improved styling
-base_template = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8" />
-    <title>BaraziliyaRank</title>
-    <!-- Bootstrap CSS -->
-    <link
-        rel="stylesheet"
-        href="https://stackpath.bootstrapcdn.com/bootswatch/4.5.2/cosmo/bootstrap.min.css"
-    />
-    <style>
-        body {
-            background-image: url('https://i.imgur.com/8Zf4gCc.jpg');
-            background-size: cover;
-            background-attachment: fixed;
-        }
-        .navbar-brand {
-            font-weight: bold;
-        }
-        .card {
-            background-color: rgba(255, 255, 255, 0.9);
-        }
-        .content-wrapper {
-            background-color: rgba(255, 255, 255, 0.9);
-            padding: 20px;
-            border-radius: 10px;
-        }
-    </style>
-</head>
-<body>
-    <!-- Header -->
-    <nav class="navbar navbar-expand-lg navbar-dark bg-primary">
-      <a class="navbar-brand" href="{{ url_for('index') }}">
-        &#9824; BaraziliyaRank
-      </a>
-    </nav>
-    {% with messages = get_flashed_messages() %}
-    {% if messages %}
-    <div class="container mt-3">
-        {% for message in messages %}
-        <div class="alert alert-info">{{ message }}</div>
-        {% endfor %}
-    </div>
-    {% endif %}
-    {% endwith %}
-    <div class="container mt-5 content-wrapper">
-        {% block content %}{% endblock %}
-    </div>
-    <!-- Bootstrap JS -->
-    <script src="https://code.jquery.com/jquery-3.5.1.slim.min.js"></script>
-    <script
-        src="https://cdn.jsdelivr.net/npm/bootstrap@4.5.2/dist/js/bootstrap.bundle.min.js"
-    ></script>
-</body>
-</html>
-'''
-
-login_template = '''
-{% extends 'base.html' %}
-{% block content %}
-<h2 class="text-center">Login</h2>
-<form method="post">
-    <div class="form-group">
-        <label for="username">Username</label>
-        <input
-            type="text"
-            class="form-control"
-            id="username"
-            name="username"
-            required
-        />
-    </div>
-    <div class="form-group">
-        <label for="password">Password</label>
-        <input
-            type="password"
-            class="form-control"
-            id="password"
-            name="password"
-            required
-        />
-    </div>
-    <button type="submit" class="btn btn-primary btn-block">Login</button>
-    <a href="{{ url_for('signup') }}" class="btn btn-link btn-block">Sign Up</a>
-</form>
-{% endblock %}
-'''
-
-signup_template = '''
-{% extends 'base.html' %}
-{% block content %}
-<h2 class="text-center">Sign Up</h2>
-<form method="post">
-    <div class="form-group">
-        <label for="username">Username</label>
-        <input
-            type="text"
-            class="form-control"
-            id="username"
-            name="username"
-            required
-        />
-    </div>
-    <div class="form-group">
-        <label for="password">Password</label>
-        <input
-            type="password"
-            class="form-control"
-            id="password"
-            name="password"
-            required
-        />
-    </div>
-    <button type="submit" class="btn btn-primary btn-block">Sign Up</button>
-    <a href="{{ url_for('login') }}" class="btn btn-link btn-block">Login</a>
-</form>
-{% endblock %}
-'''
-
-index_template = '''
-{% extends 'base.html' %}
-{% block content %}
-<h2 class="text-center">Welcome, {{ user.username }}</h2>
-{% if not user.is_approved %}
-<p class="text-center text-danger">
-    Your account is pending admin approval.
-</p>
-{% else %}
-<div class="text-center">
-    <a href="{{ url_for('dashboard') }}" class="btn btn-success btn-lg">Submit Game</a>
-    <a href="{{ url_for('leaderboard') }}" class="btn btn-info btn-lg">Leaderboard</a>
-    <a href="{{ url_for('my_games') }}" class="btn btn-warning btn-lg">My Games</a>
-    {% if user.is_admin %}
-    <a href="{{ url_for('admin_dashboard') }}" class="btn btn-danger btn-lg">Admin Dashboard</a>
-    {% endif %}
-    <a href="{{ url_for('logout') }}" class="btn btn-secondary btn-lg">Logout</a>
-</div>
-{% endif %}
-{% endblock %}
-'''
-
-dashboard_template = '''
-{% extends 'base.html' %}
-{% block content %}
-<h2 class="text-center">Submit a Game</h2>
-<form method="post">
-    <div class="form-row">
-        <div class="form-group col-md-3">
-            <label for="player1">Player 1</label>
-            <select class="form-control" id="player1" name="player1" required>
-                <option value="">Select Player</option>
-                {% for player in players %}
-                <option value="{{ player.id }}">{{ player.user.username }}</option>
-                {% endfor %}
-            </select>
-        </div>
-        <div class="form-group col-md-3">
-            <label for="player2">Player 2</label>
-            <select class="form-control" id="player2" name="player2" required>
-                <option value="">Select Player</option>
-                {% for player in players %}
-                <option value="{{ player.id }}">{{ player.user.username }}</option>
-                {% endfor %}
-            </select>
-        </div>
-        <div class="form-group col-md-3">
-            <label for="player3">Player 3</label>
-            <select class="form-control" id="player3" name="player3" required>
-                <option value="">Select Player</option>
-                {% for player in players %}
-                <option value="{{ player.id }}">{{ player.user.username }}</option>
-                {% endfor %}
-            </select>
-        </div>
-        <div class="form-group col-md-3">
-            <label for="player4">Player 4</label>
-            <select class="form-control" id="player4" name="player4" required>
-                <option value="">Select Player</option>
-                {% for player in players %}
-                <option value="{{ player.id }}">{{ player.user.username }}</option>
-                {% endfor %}
-            </select>
-        </div>
-    </div>
-    <div class="form-group">
-        <label>Winning Team</label>
-        <div>
-            <div class="form-check form-check-inline">
-                <input
-                    class="form-check-input"
-                    type="radio"
-                    name="winning_team"
-                    id="team1"
-                    value="1"
-                    required
-                />
-                <label class="form-check-label" for="team1">Team 1 (Player 1 & 2)</label>
-            </div>
-            <div class="form-check form-check-inline">
-                <input
-                    class="form-check-input"
-                    type="radio"
-                    name="winning_team"
-                    id="team2"
-                    value="2"
-                    required
-                />
-                <label class="form-check-label" for="team2">Team 2 (Player 3 & 4)</label>
-            </div>
-        </div>
-    </div>
-    <button type="submit" class="btn btn-primary btn-block">Submit Game</button>
-</form>
-<div class="text-center mt-4">
-    <a href="{{ url_for('index') }}" class="btn btn-secondary">Back to Home</a>
-    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
-</div>
-{% endblock %}
-'''
-
-leaderboard_template = '''
-{% extends 'base.html' %}
-{% block content %}
-<h2 class="text-center">Leaderboard</h2>
-<table class="table table-striped table-hover">
-    <thead class="thead-dark">
-        <tr>
-            <th scope="col">Rank</th>
-            <th scope="col">Name</th>
-            <th scope="col">ELO Rating</th>
-            <th scope="col">Games Played</th>
-        </tr>
-    </thead>
-    <tbody>
-        {% for player in players %}
-        <tr>
-            <th scope="row">{{ loop.index }}</th>
-            <td>{{ player.user.username }}</td>
-            <td>{{ player.rating|round(0) }}</td>
-            <td>{{ player.games_played }}</td>
-        </tr>
-        {% endfor %}
-    </tbody>
-</table>
-<div class="text-center">
-    <a href="{{ url_for('index') }}" class="btn btn-secondary">Back to Home</a>
-    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
-</div>
-{% endblock %}
-'''
-
-my_games_template = '''
-{% extends 'base.html' %}
-{% block content %}
-<h2 class="text-center">My Games</h2>
-{% for game in games %}
-<div class="card mb-3">
-    <div class="card-body">
-        <h5 class="card-title">
-            Game ID: {{ game.id }} - {{ game.status|capitalize }} Game - {{ game.date_submitted.strftime('%Y-%m-%d %H:%M') }}
-        </h5>
-        <p class="card-text">
-            <strong>Team 1:</strong>
-            {{ game.team1_player1.username }}, {{ game.team1_player2.username }}
-        </p>
-        <p class="card-text">
-            <strong>Team 2:</strong>
-            {{ game.team2_player1.username }}, {{ game.team2_player2.username }}
-        </p>
-        <p class="card-text">
-            <strong>Winning Team:</strong> Team {{ game.winning_team }}
-        </p>
-        <p class="card-text">
-            <strong>Confirmations:</strong> {{ game.confirmations }}/4
-        </p>
-        {% if game.processed %}
-        <p class="card-text">
-            <strong>ELO Changes:</strong>
-            <ul>
-                {% for change in game.elo_changes %}
-                <li>{{ change.player.user.username }}: {{ change.elo_change|round(2) }}</li>
-                {% endfor %}
-            </ul>
-        </p>
-        {% endif %}
-        {% if game.status == 'draft' and user.id != game.submitted_by %}
-        <a href="{{ url_for('confirm_game', game_id=game.id) }}" class="btn btn-success">Confirm Game</a>
-        {% endif %}
-    </div>
-</div>
-{% endfor %}
-<div class="text-center">
-    <a href="{{ url_for('index') }}" class="btn btn-secondary">Back to Home</a>
-    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
-</div>
-{% endblock %}
-'''
-
-admin_dashboard_template = '''
-{% extends 'base.html' %}
-{% block content %}
-<h2 class="text-center">Admin Dashboard</h2>
-<h3>Pending Users</h3>
-{% if pending_users %}
-<table class="table">
-    <thead>
-        <tr>
-            <th>Username</th>
-            <th>Actions</th>
-        </tr>
-    </thead>
-    <tbody>
-        {% for pending_user in pending_users %}
-        <tr>
-            <td>{{ pending_user.username }}</td>
-            <td>
-                <a href="{{ url_for('approve_user', user_id=pending_user.id) }}" class="btn btn-success">Approve</a>
-                <a href="{{ url_for('delete_user', user_id=pending_user.id) }}" class="btn btn-danger">Delete</a>
-            </td>
-        </tr>
-        {% endfor %}
-    </tbody>
-</table>
-{% else %}
-<p>No pending users.</p>
-{% endif %}
-<h3>All Users</h3>
-<table class="table">
-    <thead>
-        <tr>
-            <th>Username</th>
-            <th>Actions</th>
-        </tr>
-    </thead>
-    <tbody>
-        {% for u in users %}
-        <tr>
-            <td>{{ u.username }}</td>
-            <td>
-                {% if u.id != user.id %}
-                <a href="{{ url_for('delete_user', user_id=u.id) }}" class="btn btn-danger">Delete</a>
-                {% endif %}
-            </td>
-        </tr>
-        {% endfor %}
-    </tbody>
-</table>
-<h3>All Games</h3>
-{% for game in games %}
-<div class="card mb-3">
-    <div class="card-body">
-        <h5 class="card-title">
-            Game ID: {{ game.id }} - {{ game.status|capitalize }} Game - {{ game.date_submitted.strftime('%Y-%m-%d %H:%M') }}
-        </h5>
-        <p class="card-text">
-            <strong>Team 1:</strong>
-            {{ game.team1_player1.username }}, {{ game.team1_player2.username }}
-        </p>
-        <p class="card-text">
-            <strong>Team 2:</strong>
-            {{ game.team2_player1.username }}, {{ game.team2_player2.username }}
-        </p>
-        <p class="card-text">
-            <strong>Winning Team:</strong> Team {{ game.winning_team }}
-        </p>
-        <p class="card-text">
-            <strong>Confirmations:</strong> {{ game.confirmations }}/4
-        </p>
-        {% if game.processed %}
-        <p class="card-text">
-            <strong>ELO Changes:</strong>
-            <ul>
-                {% for change in game.elo_changes %}
-                <li>{{ change.player.user.username }}: {{ change.elo_change|round(2) }}</li>
-                {% endfor %}
-            </ul>
-        </p>
-        {% endif %}
-        <a href="{{ url_for('delete_game', game_id=game.id) }}" class="btn btn-danger">Delete Game</a>
-    </div>
-</div>
-{% endfor %}
-<!-- Navigation Links -->
-<div class="text-center mt-4">
-    <a href="{{ url_for('index') }}" class="btn btn-primary">Home</a>
-    <a href="{{ url_for('leaderboard') }}" class="btn btn-info">Leaderboard</a>
-    <a href="{{ url_for('dashboard') }}" class="btn btn-success">Submit Game</a>
-    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
-</div>
-{% endblock %}
-'''
-
-# Create a template dictionary
-template_dict = {
-    'base.html': base_template,
-    'login.html': login_template,
-    'signup.html': signup_template,
-    'index.html': index_template,
-    'dashboard.html': dashboard_template,
-    'leaderboard.html': leaderboard_template,
-    'my_games.html': my_games_template,
-    'admin_dashboard.html': admin_dashboard_template,
-}
-
-# Set up the DictLoader
-app.jinja_loader = DictLoader(template_dict)
-
-if __name__ == '__main__':
-    with app.app_context():
-        create_tables()
-    app.run(debug=True)
+from flask import Flask, render_template, redirect, url_for, session, request, flash, jsonify, abort, g, has_request_context
+from flask import before_render_template, template_rendered, stream_with_context
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import tuple_, select, insert, update, delete, literal, exists, bindparam, event, case, and_, union_all, cast, Integer
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import func
+from sqlalchemy.orm import joinedload, selectinload, aliased, Session
+from werkzeug.security import generate_password_hash, check_password_hash
+from markupsafe import Markup
+import bisect
+import click
+import csv
+import datetime
+import functools
+import hashlib
+import io
+import itertools
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import zlib
+from collections import namedtuple
+from jinja2 import DictLoader
+import numpy as np
+
+app = Flask(__name__)
+app.secret_key = 'your_secret_key'  # Replace with a secure secret key
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+# Storage profiles: 'default' keeps SQLite's stock settings; 'concurrent' is
+# meant for several app workers sharing one file. WAL lets readers run
+# alongside the single writer, busy_timeout makes writers queue for the
+# lock instead of failing with "database is locked", and synchronous=NORMAL
+# is durable under WAL except for the last commits on power loss.
+DATABASE_PROFILES = {
+    'default': {
+        'pragmas': {},
+        'engine': {},
+    },
+    'concurrent': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'busy_timeout': 15000,
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'MEMORY',
+        },
+        'engine': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30, 'pool_recycle': 3600},
+    },
+}
+app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE', 'default')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = DATABASE_PROFILES[app.config['DATABASE_PROFILE']]['engine']
+app.config['PAGE_SIZE'] = 50
+# Seconds a worker trusts its cached login records before reading the
+# players version again; approving or deleting a user bumps it, so other
+# workers drop their records within this window
+app.config['USER_CACHE_SECONDS'] = 10
+# Games within this window count as recent for matchmaking (partners to
+# avoid, and who has been playing most)
+app.config['MATCHMAKING_RECENT_HOURS'] = 24
+# Most hypothetical matchups one what-if request may evaluate
+app.config['WHAT_IF_MAX_MATCHUPS'] = 1000
+# Seconds polling clients may reuse /api/leaderboard before revalidating
+app.config['LEADERBOARD_API_MAX_AGE'] = 5
+# Games shown in each leaderboard sparkline
+app.config['SPARKLINE_GAMES'] = 30
+# Games together before a partner or opponent counts on a player's profile
+app.config['PROFILE_MIN_PAIR_GAMES'] = 3
+# 'inline' applies ratings on the confirming request; 'queue' hands them to
+# the rating worker (a thread under app.run, or 'flask rating-worker')
+app.config['RATING_PROCESSING'] = os.environ.get('RATING_PROCESSING', 'inline')
+# Rating engine: 'elo' or 'glicko2'. Run 'flask rebuild-ratings' after
+# switching so every stored rating comes from the same engine.
+app.config['RATING_ENGINE'] = os.environ.get('RATING_ENGINE', 'elo')
+# Glicko-2 rates the games of each rating period together once it is over
+# and RATING_PERIOD_GRACE has passed, so games confirmed a little late
+# still count in their period. A game confirmed after that replays the
+# whole history, since its period has already been rated.
+app.config['RATING_PERIOD'] = datetime.timedelta(days=1)
+app.config['RATING_PERIOD_GRACE'] = datetime.timedelta(days=2)
+app.config['GLICKO2_TAU'] = 0.5
+app.config['GLICKO2_INITIAL_VOLATILITY'] = 0.06
+# Requests slower than this many milliseconds are logged with their SQL;
+# unset to turn the slow-request log off
+app.config['SLOW_REQUEST_MS'] = float(os.environ['SLOW_REQUEST_MS']) if os.environ.get('SLOW_REQUEST_MS') else None
+db = SQLAlchemy(app)
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_profile(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma, value in DATABASE_PROFILES[app.config['DATABASE_PROFILE']]['pragmas'].items():
+        cursor.execute(f'PRAGMA {pragma} = {value}')
+    cursor.close()
+
+# Instrumentation: in-process counters and histograms, served in the
+# Prometheus text format by /metrics. Each worker process keeps its own, so
+# scrape them per process.
+class Metrics:
+    time_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    count_buckets = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.families = {}
+
+    def describe(self, name, kind, description, buckets=None):
+        self.families[name] = {'kind': kind, 'help': description, 'buckets': buckets, 'series': {}}
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.families[name]['series']
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        family = self.families[name]
+        with self.lock:
+            series = family['series'].get(key)
+            if series is None:
+                series = family['series'][key] = [[0] * (len(family['buckets']) + 1), 0.0]
+            series[0][bisect.bisect_left(family['buckets'], value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, family in self.families.items():
+                lines.append(f'# HELP {name} {family["help"]}')
+                lines.append(f'# TYPE {name} {family["kind"]}')
+                for key, series in sorted(family['series'].items()):
+                    if family['kind'] == 'counter':
+                        lines.append(f'{name}{format_labels(key)} {series}')
+                        continue
+                    counts, total = series
+                    cumulative = 0
+                    for bound, count in zip([*family['buckets'], '+Inf'], counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{format_labels(key + (("le", bound),))} {cumulative}')
+                    lines.append(f'{name}_sum{format_labels(key)} {total}')
+                    lines.append(f'{name}_count{format_labels(key)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+def format_labels(key):
+    if not key:
+        return ''
+    pairs = []
+    for label, value in key:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{label}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+metrics = Metrics()
+metrics.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status.')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency by endpoint.', Metrics.time_buckets)
+metrics.describe('http_request_queries', 'histogram', 'SQL statements per request by endpoint.', Metrics.count_buckets)
+metrics.describe('http_request_query_seconds', 'histogram', 'Time spent in SQL per request by endpoint.', Metrics.time_buckets)
+metrics.describe('template_render_seconds', 'histogram', 'Template render time by template.', Metrics.time_buckets)
+metrics.describe('function_duration_seconds', 'histogram', 'Time spent in instrumented functions.', Metrics.time_buckets)
+metrics.describe('db_queries_total', 'counter', 'SQL statements executed, in and outside requests.')
+metrics.describe('db_query_seconds_total', 'counter', 'Time spent executing SQL statements.')
+
+# Records a function's duration under its qualified name, so the rating
+# engines' apply methods show up as EloEngine.apply and Glicko2Engine.apply
+def timed(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            metrics.observe('function_duration_seconds', time.perf_counter() - started, function=function.__qualname__)
+    return wrapper
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.query_count = 0
+    g.query_time = 0.0
+    g.statements = [] if app.config['SLOW_REQUEST_MS'] is not None else None
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or 'unmatched'
+    metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.observe('http_request_duration_seconds', elapsed, endpoint=endpoint)
+    metrics.observe('http_request_queries', g.query_count, endpoint=endpoint)
+    metrics.observe('http_request_query_seconds', g.query_time, endpoint=endpoint)
+    if g.statements is not None and elapsed * 1000 >= app.config['SLOW_REQUEST_MS']:
+        app.logger.warning(
+            'Slow request: %s %s took %.1f ms with %d queries (%.1f ms in SQL)\n%s',
+            request.method, request.full_path, elapsed * 1000, g.query_count, g.query_time * 1000,
+            '\n'.join(f'  {seconds * 1000:.2f} ms: {statement}' for statement, seconds in g.statements),
+        )
+    return response
+
+# A connection runs one statement at a time, so one start time per
+# connection is enough; a statement that fails never reaches
+# after_cursor_execute and its start time is simply overwritten
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query_metrics(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started']
+    metrics.inc('db_queries_total')
+    metrics.inc('db_query_seconds_total', elapsed)
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+        g.query_time += elapsed
+        if g.statements is not None:
+            g.statements.append((statement, elapsed))
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault('render_started', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def record_render_metrics(sender, template, context, **extra):
+    if has_request_context() and g.get('render_started'):
+        metrics.observe('template_render_seconds', time.perf_counter() - g.render_started.pop(),
+                        template=template.name)
+
+# User model
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(100), nullable=False, unique=True)
+    password = db.Column(db.String(200), nullable=False)
+    is_admin = db.Column(db.Boolean, default=False)
+    is_approved = db.Column(db.Boolean, default=False)
+    player = db.relationship('Player', uselist=False, backref='user')
+
+# Player model
+class Player(db.Model):
+    id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    rating = db.Column(db.Float, default=1500)
+    games_played = db.Column(db.Integer, default=0)
+
+# Game model with relationships and ELO changes
+class Game(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    team1_player1_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    team1_player2_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    team2_player1_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    team2_player2_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    winning_team = db.Column(db.Integer)
+    submitted_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    confirmations = db.Column(db.Integer, default=1)
+    status = db.Column(db.String(50), default='draft')
+    processed = db.Column(db.Boolean, default=False)
+    date_submitted = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    # Store ELO changes
+    elo_changes = db.relationship('EloChange', backref='game', cascade='all, delete-orphan')
+
+    # Relationships
+    team1_player1 = db.relationship('User', foreign_keys=[team1_player1_id])
+    team1_player2 = db.relationship('User', foreign_keys=[team1_player2_id])
+    team2_player1 = db.relationship('User', foreign_keys=[team2_player1_id])
+    team2_player2 = db.relationship('User', foreign_keys=[team2_player2_id])
+    submitted_by_user = db.relationship('User', foreign_keys=[submitted_by])
+    participants = db.relationship('GameParticipant', backref='game', cascade='all, delete-orphan')
+    confirmed_by = db.relationship('GameConfirmation', backref='game', cascade='all, delete-orphan')
+    rating_snapshots = db.relationship('RatingSnapshot', backref='game', cascade='all, delete-orphan')
+    __table_args__ = (db.Index('ix_game_date_submitted_id', 'date_submitted', 'id'),)
+
+# GameParticipant model: one row per player per game so per-player lookups
+# are an index range scan instead of an OR over the four team columns
+class GameParticipant(db.Model):
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    team = db.Column(db.Integer, nullable=False)
+    slot = db.Column(db.Integer, nullable=False)
+    __table_args__ = (db.Index('ix_game_participant_user_game', 'user_id', 'game_id'),)
+
+# GameConfirmation model: ledger of who confirmed which game; the primary
+# key makes a repeated confirmation by the same player a no-op
+class GameConfirmation(db.Model):
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    confirmed_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+# (team, slot, column) for each of the four seats in a game
+PARTICIPANT_COLUMNS = (
+    (1, 1, Game.team1_player1_id),
+    (1, 2, Game.team1_player2_id),
+    (2, 1, Game.team2_player1_id),
+    (2, 2, Game.team2_player2_id),
+)
+
+# EloChange model to track ELO changes per player per game
+class EloChange(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), index=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), index=True)
+    elo_change = db.Column(db.Float)
+    player = db.relationship('Player')
+
+# RatingQueue model: durable queue of confirmed games waiting for the rating
+# worker, drained in id (confirmation) order
+class RatingQueue(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False, unique=True)
+    enqueued_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+# ImportJob model: progress of a bulk import, committed with each batch so
+# an interrupted import resumes after its last committed batch. The row is
+# deleted once the import finishes.
+class ImportJob(db.Model):
+    name = db.Column(db.String(200), primary_key=True)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    games_imported = db.Column(db.Integer, nullable=False, default=0)
+
+# RatingSnapshot model: a player's rating after each of their games, with
+# ts the time the rating took that value (processing time for live games,
+# submission time after a replay)
+class RatingSnapshot(db.Model):
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), primary_key=True)
+    rating_after = db.Column(db.Float, nullable=False)
+    ts = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (db.Index('ix_rating_snapshot_player_ts', 'player_id', 'ts', 'game_id'),)
+
+# Counter model: named, monotonically increasing counters such as the
+# ratings version that caches are keyed on
+class Counter(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+# GlickoState model: the Glicko-2 rating deviation and volatility of each
+# player, and the last rating period they played in. The rating itself
+# stays in Player.rating.
+class GlickoState(db.Model):
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    rating_deviation = db.Column(db.Float, nullable=False)
+    volatility = db.Column(db.Float, nullable=False)
+    last_period = db.Column(db.Integer, nullable=False)
+
+# PlayerStats model: results per player over their processed games in
+# date_submitted order. streak is the current run, positive for wins and
+# negative for losses.
+class PlayerStats(db.Model):
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    losses = db.Column(db.Integer, nullable=False, default=0)
+    streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_win_streak = db.Column(db.Integer, nullable=False, default=0)
+
+# PairStats model: results of player_a with player_b as partner and against
+# player_b as opponent. Only pairs that have met get a row, and every pair
+# is stored both ways round, so a player's row set is one range scan.
+class PairStats(db.Model):
+    player_a = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    player_b = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    partner_wins = db.Column(db.Integer, nullable=False, default=0)
+    partner_losses = db.Column(db.Integer, nullable=False, default=0)
+    opponent_wins = db.Column(db.Integer, nullable=False, default=0)
+    opponent_losses = db.Column(db.Integer, nullable=False, default=0)
+
+PAIR_STATS_COLUMNS = ('partner_wins', 'partner_losses', 'opponent_wins', 'opponent_losses')
+
+# Season model: the current season is the one that is not closed yet. A
+# season starts every player at 1500 plus carry_over times their distance
+# from 1500 at the end of the previous season.
+class Season(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    closed_at = db.Column(db.DateTime)
+    carry_over = db.Column(db.Float, nullable=False, default=1.0)
+
+# SeasonStanding model: the final leaderboard of a closed season, with the
+# usernames as they were, so it outlives deleted players
+class SeasonStanding(db.Model):
+    season_id = db.Column(db.Integer, db.ForeignKey('season.id'), primary_key=True)
+    player_id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(100), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    rating = db.Column(db.Float, nullable=False)
+    games_played = db.Column(db.Integer, nullable=False)
+    wins = db.Column(db.Integer, nullable=False)
+    losses = db.Column(db.Integer, nullable=False)
+    __table_args__ = (db.Index('ix_season_standing_player', 'player_id', 'season_id'),)
+
+# Archive models: the rated games of closed seasons with their ELO changes
+# and rating snapshots, moved out of the live tables by close_season and
+# never written again. SQLite may hand out a game id again once the live
+# table has been emptied, so archived games are keyed by season and id.
+class ArchivedGame(db.Model):
+    season_id = db.Column(db.Integer, db.ForeignKey('season.id'), primary_key=True)
+    id = db.Column(db.Integer, primary_key=True)
+    team1_player1_id = db.Column(db.Integer)
+    team1_player2_id = db.Column(db.Integer)
+    team2_player1_id = db.Column(db.Integer)
+    team2_player2_id = db.Column(db.Integer)
+    winning_team = db.Column(db.Integer)
+    submitted_by = db.Column(db.Integer)
+    date_submitted = db.Column(db.DateTime)
+    __table_args__ = (db.Index('ix_archived_game_season_date', 'season_id', 'date_submitted', 'id'),)
+
+class ArchivedEloChange(db.Model):
+    season_id = db.Column(db.Integer, db.ForeignKey('season.id'), primary_key=True)
+    game_id = db.Column(db.Integer, primary_key=True)
+    player_id = db.Column(db.Integer, primary_key=True)
+    elo_change = db.Column(db.Float)
+
+class ArchivedRatingSnapshot(db.Model):
+    season_id = db.Column(db.Integer, db.ForeignKey('season.id'), primary_key=True)
+    player_id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, primary_key=True)
+    rating_after = db.Column(db.Float, nullable=False)
+    ts = db.Column(db.DateTime, nullable=False)
+
+def bump_counter(name):
+    value = db.session.execute(
+        update(Counter).where(Counter.name == name).values(value=Counter.value + 1).returning(Counter.value)
+    ).scalar()
+    if value is None:
+        db.session.add(Counter(name=name, value=1))
+        value = 1
+    return value
+
+def counter_value(name):
+    return db.session.execute(select(Counter.value).where(Counter.name == name)).scalar() or 0
+
+# Moves a counter up to value; never moves it back
+def raise_counter(name, value):
+    upsert = sqlite_insert(Counter).values(name=name, value=value)
+    db.session.execute(upsert.on_conflict_do_update(
+        index_elements=['name'], set_={'value': func.max(Counter.value, upsert.excluded.value)}))
+
+# Bumped in the same transaction as any change to ratings or to the set of
+# ranked players, so every worker sees the new version once it commits.
+# rank_changes lists the (player_id, rating, username) moves behind the
+# bump, rating None for removals; they are applied to rank_index in place
+# once the transaction commits. Without them the index reloads instead.
+def bump_ratings_version(rank_changes=None):
+    version = bump_counter('ratings')
+    pending = db.session.info.setdefault('rank_changes', {'base': version - 1, 'changes': []})
+    if rank_changes is None:
+        pending['changes'] = None
+    elif pending['changes'] is not None:
+        pending['changes'].extend(rank_changes)
+    pending['version'] = version
+    return version
+
+@event.listens_for(Session, 'after_commit')
+def apply_rank_changes(session):
+    pending = session.info.pop('rank_changes', None)
+    if pending:
+        rank_index.apply(pending['base'], pending['version'], pending['changes'])
+
+@event.listens_for(Session, 'after_rollback')
+def discard_rank_changes(session):
+    session.info.pop('rank_changes', None)
+
+def ratings_version():
+    return counter_value('ratings')
+
+# Bumped whenever a player is approved or deleted; the username search
+# index is keyed on it
+def bump_players_version():
+    bump_counter('players')
+
+def players_version():
+    return counter_value('players')
+
+# Game feed query: loads the four participants, the ELO changes and their
+# usernames up front so rendering a list of game cards costs a fixed number
+# of queries no matter how many games are shown
+def game_feed_query():
+    return Game.query.options(
+        joinedload(Game.team1_player1),
+        joinedload(Game.team1_player2),
+        joinedload(Game.team2_player1),
+        joinedload(Game.team2_player2),
+        selectinload(Game.elo_changes).joinedload(EloChange.player).joinedload(Player.user),
+    )
+
+# Keyset pagination: pages are selected with a (sort key, id) cursor instead
+# of OFFSET, so a deep page costs the same index seek as the first one
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+def encode_cursor(values):
+    return '_'.join(v.isoformat() if isinstance(v, datetime.datetime) else str(v) for v in values)
+
+def decode_cursor(cursor, parsers):
+    if not cursor:
+        return None
+    parts = cursor.split('_')
+    if len(parts) != len(parsers):
+        return None
+    try:
+        return tuple(parse(part) for parse, part in zip(parsers, parts))
+    except ValueError:
+        return None
+
+def keyset_paginate(query, columns, parsers, page_size=None):
+    page_size = page_size or app.config['PAGE_SIZE']
+    before = decode_cursor(request.args.get('before'), parsers)
+    after = decode_cursor(request.args.get('after'), parsers)
+    key = tuple_(*columns)
+    # Pages run in descending key order; going backwards flips the order
+    # and the rows are reversed again after fetching
+    if before is not None:
+        query = query.filter(key > tuple_(*before)).order_by(*[c.asc() for c in columns])
+    else:
+        if after is not None:
+            query = query.filter(key < tuple_(*after))
+        query = query.order_by(*[c.desc() for c in columns])
+    rows = query.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before is not None:
+        rows.reverse()
+    if not rows:
+        return Page(rows, None, None)
+    first = encode_cursor([getattr(rows[0], c.key) for c in columns])
+    last = encode_cursor([getattr(rows[-1], c.key) for c in columns])
+    if before is not None:
+        return Page(rows, last, first if has_more else None)
+    return Page(rows, last if has_more else None, first if after is not None else None)
+
+def paginate_games(query):
+    return keyset_paginate(query, [Game.date_submitted, Game.id], [datetime.datetime.fromisoformat, int])
+
+def set_participants(game):
+    game.participants = [
+        GameParticipant(user_id=int(getattr(game, column.key)), team=team, slot=slot)
+        for team, slot, column in PARTICIPANT_COLUMNS
+    ]
+
+def player_games_query(user_id, query=None):
+    query = query if query is not None else Game.query
+    return query.join(GameParticipant, GameParticipant.game_id == Game.id).filter(GameParticipant.user_id == user_id)
+
+# create_all only creates missing tables, so indexes added to existing
+# tables are created here
+def create_missing_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+# Fill GameParticipant for games created before the table existed
+def backfill_participants():
+    db.create_all()
+    create_missing_indexes()
+    inserted = 0
+    for team, slot, column in PARTICIPANT_COLUMNS:
+        missing = ~exists().where(
+            GameParticipant.game_id == Game.id,
+            GameParticipant.team == team,
+            GameParticipant.slot == slot,
+        )
+        rows = select(Game.id, column, literal(team), literal(slot)).where(column.isnot(None), missing)
+        result = db.session.execute(
+            insert(GameParticipant).from_select(['game_id', 'user_id', 'team', 'slot'], rows)
+        )
+        inserted += result.rowcount
+    db.session.commit()
+    return inserted
+
+@app.cli.command('backfill-participants')
+def backfill_participants_command():
+    inserted = backfill_participants()
+    print(f'Inserted {inserted} game participant rows.')
+
+def create_tables(demo=True):
+    db.create_all()
+    create_missing_indexes()
+    # Check if admin exists
+    if not User.query.filter_by(username='admin').first():
+        admin_user = User(
+            username='admin',
+            password=generate_password_hash('zz99rash'),
+            is_admin=True,
+            is_approved=True
+        )
+        db.session.add(admin_user)
+        db.session.commit()
+    current_season()
+    db.session.commit()
+    # Create demo users and games
+    if demo:
+        create_demo_data()
+
+def create_demo_data():
+    if User.query.count() > 1:  # Admin already exists
+        return
+    generate_league(players=10, games=50)
+
+# Matches how SQLAlchemy stores DateTime values in SQLite
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Plain executemany of row tuples; at generator volumes SQLAlchemy's
+# per-row parameter processing costs more than SQLite's own insert
+def insert_rows(model, columns, rows):
+    sql = f'INSERT INTO {model.__table__.name} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+    db.session.connection().exec_driver_sql(sql, rows)
+
+# Synthetic data generator: bulk-inserts players and games in one
+# transaction per chunk. Usable from the CLI below or from a test fixture
+# inside an app context, e.g. generate_league(players=1000, games=100000, seed=1)
+def generate_league(players=10, games=50, seed=None, chunk_size=20000):
+    rng = np.random.default_rng(seed)
+    create_synthetic_players(players, chunk_size)
+    simulate_games(games, rng=rng, chunk_size=chunk_size)
+
+def create_synthetic_players(count, chunk_size=20000):
+    # Every demo player shares the same password, so hash it once
+    password = generate_password_hash('123')
+    first_id = (db.session.execute(select(func.max(User.id))).scalar() or 0) + 1
+    # Number after the highest existing playerN, so names freed by deleted
+    # players are never handed out next to ones still in use
+    first_number = (db.session.execute(
+        select(func.max(cast(func.substr(User.username, len('player') + 1), Integer)))
+        .where(User.username.op('GLOB')('player[0-9]*'))
+    ).scalar() or 0) + 1
+    for start in range(0, count, chunk_size):
+        ids = range(first_id + start, first_id + min(start + chunk_size, count))
+        insert_rows(User, ['id', 'username', 'password', 'is_admin', 'is_approved'], [
+            (user_id, f'player{first_number + user_id - first_id}', password, False, True) for user_id in ids
+        ])
+        insert_rows(Player, ['id', 'rating', 'games_played'], [(user_id, 1500.0, 0) for user_id in ids])
+        bump_players_version()
+        db.session.commit()
+
+# Plays synthetic games between the approved players. Each player gets a
+# hidden skill (normal around 1500) and an activity weight (log-normal, so a
+# few regulars play most games); the winner is drawn from the ELO expected
+# score of the two teams' skills.
+def simulate_games(games=50, seed=None, rng=None, chunk_size=20000, interval=datetime.timedelta(minutes=10)):
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    engine = rating_engine()
+    rows = db.session.execute(
+        select(Player.id, Player.rating, Player.games_played)
+        .join(User, User.id == Player.id)
+        .where(User.is_approved == True, User.is_admin == False)
+        .order_by(Player.id)
+    ).all()
+    if len(rows) < 4:
+        raise ValueError('At least four approved players are needed to simulate games.')
+    player_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    skills = rng.normal(1500, 200, len(rows))
+    activity = rng.lognormal(0, 1, len(rows))
+    activity /= activity.sum()
+    size = int(player_ids.max()) + 1
+    ratings = np.zeros(size)
+    ratings[player_ids] = [row[1] for row in rows]
+    games_played = np.zeros(size, dtype=np.int64)
+    games_played[player_ids] = [row[2] for row in rows]
+    admin = User.query.filter_by(is_admin=True).order_by(User.id).first()
+    next_game_id = (db.session.execute(select(func.max(Game.id))).scalar() or 0) + 1
+    latest = db.session.execute(select(func.max(Game.date_submitted))).scalar()
+    first_date = latest + interval if latest else datetime.datetime.utcnow() - interval * games
+
+    for start in range(0, games, chunk_size):
+        count = min(chunk_size, games - start)
+        # Draw four distinct players per game, redrawing rows with repeats
+        seats = rng.choice(len(rows), size=(count, 4), p=activity)
+        while True:
+            ordered = np.sort(seats, axis=1)
+            repeated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+            if not repeated.any():
+                break
+            seats[repeated] = rng.choice(len(rows), size=(int(repeated.sum()), 4), p=activity)
+        team_skill_gap = skills[seats[:, 2:]].mean(axis=1) - skills[seats[:, :2]].mean(axis=1)
+        team1_wins = rng.random(count) < 1 / (1 + 10 ** (team_skill_gap / 400))
+        winning_teams = np.where(team1_wins, 1, 2)
+        seats = player_ids[seats]
+
+        game_ids = range(next_game_id, next_game_id + count)
+        next_game_id += count
+        seat_rows = seats.tolist()
+        dates = [(first_date + interval * (start + offset)).strftime(SQLITE_DATETIME_FORMAT) for offset in range(count)]
+        insert_rows(Game, [
+            'id', 'team1_player1_id', 'team1_player2_id', 'team2_player1_id', 'team2_player2_id',
+            'winning_team', 'submitted_by', 'confirmations', 'status', 'processed', 'date_submitted',
+        ], [
+            (game_id, *seat, winner, admin.id, 4, 'confirmed', True, date)
+            for game_id, seat, winner, date in zip(game_ids, seat_rows, winning_teams.tolist(), dates)
+        ])
+        insert_rows(GameParticipant, ['game_id', 'user_id', 'team', 'slot'], [
+            (game_id, player_id, team, slot)
+            for game_id, seat in zip(game_ids, seat_rows)
+            for (team, slot, _), player_id in zip(PARTICIPANT_COLUMNS, seat)
+        ])
+        if not engine.incremental:
+            engine.close_periods()
+            db.session.commit()
+            continue
+        ratings, played, deltas, after = replay_ratings(seats, winning_teams, size, initial_rating=ratings)
+        games_played += played
+        insert_rows(EloChange, ['game_id', 'player_id', 'elo_change'], [
+            (game_id, player_id, delta)
+            for game_id, seat, game_deltas in zip(game_ids, seat_rows, deltas.tolist())
+            for player_id, delta in zip(seat, game_deltas)
+        ])
+        insert_rows(RatingSnapshot, ['player_id', 'game_id', 'rating_after', 'ts'], [
+            (player_id, game_id, rating, date)
+            for game_id, seat, game_after, date in zip(game_ids, seat_rows, after.tolist(), dates)
+            for player_id, rating in zip(seat, game_after)
+        ])
+        touched = np.unique(seats)
+        db.session.execute(update(Player), [
+            {'id': player_id, 'rating': rating, 'games_played': played}
+            for player_id, rating, played in zip(
+                touched.tolist(), ratings[touched].tolist(), games_played[touched].tolist())
+        ])
+        bump_ratings_version()
+        db.session.commit()
+    rebuild_stats()
+    db.session.commit()
+
+@app.cli.command('generate-data')
+@click.option('--players', default=10, show_default=True)
+@click.option('--games', default=50, show_default=True)
+@click.option('--seed', type=int)
+@click.option('--chunk-size', default=20000, show_default=True)
+def generate_data_command(players, games, seed, chunk_size):
+    create_tables(demo=False)
+    started = time.perf_counter()
+    generate_league(players, games, seed, chunk_size)
+    print(f'Generated {players} players and {games} games in {time.perf_counter() - started:.2f}s.')
+
+CurrentUser = namedtuple('CurrentUser', ['id', 'username', 'is_admin', 'is_approved'])
+
+# CurrentUser records by user id. Hits cost no query; once every
+# USER_CACHE_SECONDS the players version is read again, and every record
+# is dropped if it has moved.
+class UserCache:
+    max_entries = 1024
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.expires = 0.0
+        self.entries = {}
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+    def validate(self, version):
+        with self.lock:
+            if version != self.version:
+                self.entries = {}
+                self.version = version
+            self.expires = time.monotonic() + app.config['USER_CACHE_SECONDS']
+
+    def get(self, user_id):
+        with self.lock:
+            return self.entries.get(user_id)
+
+    def put(self, user):
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[user.id] = user
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+user_cache = UserCache()
+
+# Loads the logged-in user once per request into g.user: their name and
+# flags in one query, or none at all on a cache hit. A session whose user
+# has been deleted is logged out.
+def current_user():
+    if 'user' not in g:
+        g.user = None
+        user_id = session.get('user_id')
+        if user_id is not None:
+            if user_cache.expired():
+                user_cache.validate(players_version())
+            g.user = user_cache.get(user_id)
+            if g.user is None:
+                row = db.session.execute(
+                    select(User.id, User.username, User.is_admin, User.is_approved).where(User.id == user_id)
+                ).first()
+                if row is None:
+                    session.pop('user_id', None)
+                else:
+                    g.user = CurrentUser(*row)
+                    user_cache.put(g.user)
+    return g.user
+
+# g is shared by every request made inside an outer app context (the
+# benchmark and stress commands), so each request starts without a user
+@app.before_request
+def forget_current_user():
+    g.pop('user', None)
+
+# Replaces the per-route session checks. Anonymous users go to the login
+# page (or get a 401 from API routes); approved=True and admin=True send
+# everyone else back to the home page.
+def login_required(view=None, *, approved=False, admin=False, api=False):
+    if view is None:
+        return functools.partial(login_required, approved=approved, admin=admin, api=api)
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        user = current_user()
+        if user is None:
+            if api:
+                return jsonify({'error': 'Login required.'}), 401
+            return redirect(url_for('login'))
+        if admin and not user.is_admin:
+            return redirect(url_for('index'))
+        if approved and not user.is_approved:
+            flash('Your account is pending admin approval.')
+            return redirect(url_for('index'))
+        return view(*args, **kwargs)
+    return wrapper
+
+# Login Route
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if 'user_id' in session:
+        return redirect(url_for('index'))
+    if request.method == 'POST':
+        username = request.form['username'].strip().lower()
+        password = request.form['password'].strip()
+        user = User.query.filter_by(username=username).first()
+        if user and check_password_hash(user.password, password):
+            if not user.is_approved:
+                flash('Your account is pending admin approval.')
+                return redirect(url_for('login'))
+            session['user_id'] = user.id
+            return redirect(url_for('index'))
+        else:
+            flash('Invalid credentials.')
+    return render_template('login.html')
+
+# Sign Up Route
+@app.route('/signup', methods=['GET', 'POST'])
+def signup():
+    if request.method == 'POST':
+        username = request.form['username'].strip().lower()
+        password = request.form['password'].strip()
+        if User.query.filter_by(username=username).first():
+            flash('Username already exists.')
+            return redirect(url_for('signup'))
+        new_user = User(
+            username=username,
+            password=generate_password_hash(password),
+            is_approved=False
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        flash('Your account is pending admin approval.')
+        return redirect(url_for('login'))
+    return render_template('signup.html')
+
+# Logout Route
+@app.route('/logout')
+def logout():
+    session.pop('user_id', None)
+    flash('You have been logged out.')
+    return redirect(url_for('login'))
+
+# Home Route
+@app.route('/')
+@login_required
+def index():
+    user = g.user
+    rank, neighbours = rank_index.around(ratings_version(), user.id)
+    return render_template('index.html', user=user, rank=rank, neighbours=neighbours,
+                           ranked=len(rank_index.players))
+
+# Submit Game Route (formerly Dashboard)
+@app.route('/dashboard', methods=['GET', 'POST'])
+@login_required(approved=True)
+def dashboard():
+    user = g.user
+    if request.method == 'POST':
+        # Handle game submission; players are entered by username
+        names = [request.form.get(f'player{number}', '').strip() for number in range(1, 5)]
+        winning_team = request.form.get('winning_team')
+        if not all(names + [winning_team]):
+            flash('Please select all players and the winning team.')
+            return redirect(url_for('dashboard'))
+        version = players_version()
+        unknown = [name for name in names if player_search.lookup(version, name) is None]
+        if unknown:
+            flash('Unknown player: ' + ', '.join(unknown))
+            return redirect(url_for('dashboard'))
+        team1_player1_id, team1_player2_id, team2_player1_id, team2_player2_id = [
+            player_search.lookup(version, name) for name in names
+        ]
+        # Ensure unique players
+        selected_players = {team1_player1_id, team1_player2_id, team2_player1_id, team2_player2_id}
+        if len(selected_players) < 4:
+            flash('Each player must be unique.')
+            return redirect(url_for('dashboard'))
+        winning_team = int(winning_team)
+        game = Game(
+            team1_player1_id=team1_player1_id,
+            team1_player2_id=team1_player2_id,
+            team2_player1_id=team2_player1_id,
+            team2_player2_id=team2_player2_id,
+            winning_team=winning_team,
+            submitted_by=user.id,
+            confirmations=1,
+            status='draft',
+            processed=False
+        )
+        set_participants(game)
+        # Submitting counts as the submitter's confirmation
+        game.confirmed_by = [GameConfirmation(user_id=user.id)]
+        db.session.add(game)
+        db.session.commit()
+        flash('Game submitted and is pending confirmation.')
+        return redirect(url_for('my_games'))
+    return render_template('dashboard.html', user=user)
+
+# My Games Route
+@app.route('/my_games')
+@login_required
+def my_games():
+    user = g.user
+    page = paginate_games(player_games_query(user.id, game_feed_query()))
+    return render_template('my_games.html', user=user, games=page.items, page=page)
+
+# Confirm Game Route
+@app.route('/confirm_game/<int:game_id>')
+@login_required
+def confirm_game(game_id):
+    game = db.session.get(Game, game_id)
+    user = g.user
+    if game.status == 'confirmed':
+        flash('Game already confirmed.')
+        return redirect(url_for('my_games'))
+    # Check if user is part of the game
+    if str(user.id) not in [
+        str(game.team1_player1_id),
+        str(game.team1_player2_id),
+        str(game.team2_player1_id),
+        str(game.team2_player2_id)
+    ]:
+        flash('You are not a participant in this game.')
+        return redirect(url_for('my_games'))
+    # Record the confirmation in the ledger; a second click inserts nothing
+    recorded = db.session.execute(
+        sqlite_insert(GameConfirmation).values(game_id=game.id, user_id=user.id, confirmed_at=datetime.datetime.utcnow())
+        .on_conflict_do_nothing()
+    ).rowcount
+    if not recorded:
+        db.session.rollback()
+        flash('You have already confirmed this game.')
+        return redirect(url_for('my_games'))
+    # Count it with one conditional UPDATE; only the confirmation that moves
+    # the game out of draft sees 'confirmed' come back, so ratings are
+    # applied exactly once
+    status = db.session.execute(
+        update(Game).where(Game.id == game.id, Game.status == 'draft')
+        .values(
+            confirmations=Game.confirmations + 1,
+            status=case((Game.confirmations + 1 >= 3, 'confirmed'), else_=Game.status),
+        )
+        .returning(Game.status)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if status is None:
+        db.session.rollback()
+        flash('Game already confirmed.')
+        return redirect(url_for('my_games'))
+    queued = False
+    if status == 'confirmed':
+        if app.config['RATING_PROCESSING'] == 'queue':
+            db.session.add(RatingQueue(game_id=game.id))
+            queued = True
+        else:
+            apply_games([game.id])
+    db.session.commit()
+    if queued:
+        rating_worker_wakeup.set()
+    flash('Game confirmed.')
+    return redirect(url_for('my_games'))
+
+@timed
+def process_game(game_id):
+    process_games([game_id])
+
+def process_games(game_ids):
+    processed = apply_games(game_ids)
+    db.session.commit()
+    return processed
+
+# Applies ratings for confirmed games in the order given, without
+# committing. Claiming the games takes the write lock first, so the
+# ratings the engine loads next can't change underneath us; the claim
+# returns the game rows, so they are read once for the stats and the engine.
+@timed
+def apply_games(game_ids):
+    game_ids = list(game_ids)
+    games = db.session.execute(
+        update(Game).where(Game.id.in_(game_ids), Game.processed == False)
+        .values(processed=True)
+        .returning(Game.id, Game.date_submitted, Game.winning_team, *[column for _, _, column in PARTICIPANT_COLUMNS])
+    ).all()
+    if not games:
+        return 0
+    position = {game_id: index for index, game_id in enumerate(game_ids)}
+    games.sort(key=lambda row: position[row[0]])
+    record_results([(game_id, date_submitted, seats, winning_team)
+                    for game_id, date_submitted, winning_team, *seats in games])
+    return rating_engine().apply(games)
+
+# Rating worker: drains RatingQueue in order. Queue rows are deleted in the
+# same transaction that applies their games, so a restart resumes exactly
+# where the last commit left off and nothing is processed twice.
+rating_worker_wakeup = threading.Event()
+
+def drain_rating_queue(batch_size=100):
+    entries = db.session.execute(
+        select(RatingQueue.id, RatingQueue.game_id).order_by(RatingQueue.id).limit(batch_size)
+    ).all()
+    if not entries:
+        db.session.commit()
+        return 0
+    apply_games([game_id for _, game_id in entries])
+    db.session.execute(delete(RatingQueue).where(RatingQueue.id.in_([entry_id for entry_id, _ in entries])))
+    db.session.commit()
+    return len(entries)
+
+def run_rating_worker(stop=None, poll_interval=2.0):
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                drained = drain_rating_queue()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Rating worker failed to drain the queue')
+                drained = 0
+        if not drained:
+            rating_worker_wakeup.wait(poll_interval)
+            rating_worker_wakeup.clear()
+
+def start_rating_worker():
+    worker = threading.Thread(target=run_rating_worker, name='rating-worker', daemon=True)
+    worker.start()
+    return worker
+
+@app.cli.command('rating-worker')
+def rating_worker_command():
+    print('Rating worker started; press Ctrl+C to stop.')
+    try:
+        run_rating_worker()
+    except KeyboardInterrupt:
+        pass
+
+def expected_score(team1_rating, team2_rating):
+    return 1 / (1 + 10 ** ((team2_rating - team1_rating) / 400))
+
+# The Elo update, written once for both forms: ratings and k hold the
+# four seats' ratings and K-factors (team 1 then team 2), as floats for one
+# game or as arrays for a batch. Returns team 1's expected score and the
+# four seats' deltas.
+def elo_update(ratings, k, team1_won):
+    expected = expected_score((ratings[0] + ratings[1]) / 2, (ratings[2] + ratings[3]) / 2)
+    change = team1_won - expected
+    return expected, [k[0] * change, k[1] * change, -k[2] * change, -k[3] * change]
+
+# Rating kernel: ratings is an (n, 4) array of the players' ratings before
+# each game (team 1 then team 2) and winning_teams the n winners. Returns
+# team 1's expected score and the (n, 4) rating deltas. The games are
+# rated independently, so they must not share players; replay_ratings
+# takes care of that for sequences of games.
+def elo_kernel(ratings, winning_teams):
+    ratings = np.asarray(ratings, dtype=np.float64)
+    expected, deltas = elo_update(ratings.T, k_factors(ratings).T, np.asarray(winning_teams) == 1)
+    return expected, np.stack(deltas, axis=1)
+
+# Scalar form of elo_kernel for a single game, for loops where NumPy's
+# per-call overhead would dominate; returns the four seats' deltas
+def elo_deltas(ratings, winning_team):
+    return elo_update(ratings, [get_k_factor(rating) for rating in ratings], winning_team == 1)[1]
+
+def get_k_factor(rating):
+    if rating >= 2400:
+        return 16
+    elif rating >= 2100:
+        return 24
+    else:
+        return 32
+
+# Array form of get_k_factor
+def k_factors(ratings):
+    return np.where(ratings >= 2400, 16, np.where(ratings >= 2100, 24, 32))
+
+# Splits the ordered games into runs where no player appears twice, so each
+# run can be applied with one vectorized update without changing the result
+def conflict_free_batches(seats):
+    n = len(seats)
+    flat_players = seats.ravel()
+    flat_games = np.repeat(np.arange(n), seats.shape[1])
+    order = np.lexsort((flat_games, flat_players))
+    sorted_players = flat_players[order]
+    sorted_games = flat_games[order]
+    previous = np.full(len(order), -1)
+    same_player = sorted_players[1:] == sorted_players[:-1]
+    previous[1:][same_player] = sorted_games[:-1][same_player]
+    previous_game = np.empty(len(order), dtype=np.int64)
+    previous_game[order] = previous
+    previous_game = previous_game.reshape(seats.shape).max(axis=1)
+    boundaries = [0]
+    start = 0
+    for game, last_seen in enumerate(previous_game.tolist()):
+        if last_seen >= start:
+            start = game
+            boundaries.append(game)
+    boundaries.append(n)
+    return boundaries
+
+# Full-history replay: seats is an (n, 4) array of player ids (team 1 then
+# team 2) and winning_teams the matching winners, applied in order through
+# elo_kernel; returns final ratings and games
+# played indexed by player id, plus the (n, 4) per-seat deltas and ratings
+# after each game
+def replay_ratings(seats, winning_teams, size, initial_rating=1500.0, min_batch=8):
+    # initial_rating may also be an array of starting ratings by player id
+    ratings = np.empty(size, dtype=np.float64)
+    ratings[:] = initial_rating
+    deltas = np.zeros(seats.shape, dtype=np.float64)
+    after = np.zeros(seats.shape, dtype=np.float64)
+    seat_rows = seats.tolist()
+    winners = winning_teams.tolist()
+    boundaries = conflict_free_batches(seats)
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        # Small leagues produce short runs where the per-call overhead of
+        # NumPy outweighs the work, so those games are applied one by one
+        if end - start < min_batch:
+            for game in range(start, end):
+                players = seat_rows[game]
+                current = [ratings.item(player) for player in players]
+                game_deltas = elo_deltas(current, winners[game])
+                for seat, (player, rating, delta) in enumerate(zip(players, current, game_deltas)):
+                    deltas[game, seat] = delta
+                    ratings[player] = after[game, seat] = rating + delta
+            continue
+        batch = seats[start:end]
+        current = ratings[batch]
+        _, batch_deltas = elo_kernel(current, winning_teams[start:end])
+        deltas[start:end] = batch_deltas
+        after[start:end] = current + batch_deltas
+        ratings[batch] = after[start:end]
+    games_played = np.bincount(seats.ravel(), minlength=size)
+    return ratings, games_played, deltas, after
+
+# Rating engines: everything that rates games (confirmations, imports, the
+# full-history replay) goes through the engine named by RATING_ENGINE.
+# replay rates a whole history from scratch and returns the engine's extra
+# per-player state for save_state; apply rates newly processed games
+# against the stored ratings, given the (id, date_submitted, winning_team,
+# four seat ids) rows apply_games claimed, in order. Incremental engines rate each game as soon as
+# it is confirmed, which lets imports and game removal patch ratings in
+# place; the others fall back to apply and rebuild_ratings.
+class EloEngine:
+    name = 'elo'
+    incremental = True
+
+    # Games submitted from here on are left for a later apply
+    def cutoff(self):
+        return None
+
+    def replay(self, seats, winning_teams, dates, size, initial_rating=1500.0):
+        return (*replay_ratings(seats, winning_teams, size, initial_rating), None)
+
+    def save_state(self, player_ids, state):
+        pass
+
+    # One query loads the players' ratings, and the results are written
+    # with one bulk UPDATE and one bulk EloChange insert. Games with a
+    # player who has since been deleted are left unrated.
+    @timed
+    def apply(self, games):
+        stored = dict(db.session.execute(
+            select(Player.id, Player.rating)
+            .where(Player.id.in_({player_id for row in games for player_id in row[3:]}))
+        ).all())
+        rows = [row for row in games if all(player_id in stored for player_id in row[3:])]
+        if not rows:
+            return 0
+
+        # Replay the batch over local player indices so every game goes
+        # through elo_kernel, starting from the ratings stored before it
+        player_ids = list(dict.fromkeys(player_id for row in rows for player_id in row[3:]))
+        local = {player_id: index for index, player_id in enumerate(player_ids)}
+        seat_array = np.array([[local[player_id] for player_id in row[3:]] for row in rows], dtype=np.int64)
+        final, played, deltas, after = replay_ratings(
+            seat_array, np.array([row[2] for row in rows]), len(player_ids),
+            initial_rating=np.array([stored[player_id] for player_id in player_ids], dtype=np.float64), min_batch=1,
+        )
+
+        now = datetime.datetime.utcnow()
+        elo_changes = []
+        snapshots = []
+        for row, game_deltas, game_after in zip(rows, deltas.tolist(), after.tolist()):
+            for player_id, delta, rating in zip(row[3:], game_deltas, game_after):
+                elo_changes.append({'game_id': row[0], 'player_id': player_id, 'elo_change': delta})
+                snapshots.append({'player_id': player_id, 'game_id': row[0], 'rating_after': rating, 'ts': now})
+        players = Player.__table__
+        db.session.execute(
+            players.update().where(players.c.id == bindparam('player_id'))
+            .values(rating=bindparam('new_rating'), games_played=players.c.games_played + bindparam('played')),
+            [{'player_id': player_id, 'new_rating': rating, 'played': count}
+             for player_id, rating, count in zip(player_ids, final.tolist(), played.tolist())],
+        )
+        db.session.execute(insert(EloChange), elo_changes)
+        db.session.execute(insert(RatingSnapshot), snapshots)
+        bump_ratings_version([(player_id, rating, None) for player_id, rating in zip(player_ids, final.tolist())])
+        return len(rows)
+
+# Glicko-2 (Glickman, 2013) over rating periods of RATING_PERIOD. All
+# players active in a period are updated together from their ratings at
+# the start of it. Each player faces the opposing team as one composite
+# opponent (mean rating, root-mean-square deviation); the per-game deltas
+# are each game's share of the period update, so they add up to it exactly.
+class Glicko2Engine:
+    name = 'glicko2'
+    incremental = False
+    scale = 173.7178
+    initial_deviation = 350.0
+    epoch = datetime.datetime(2000, 1, 3)
+
+    def period(self, date):
+        return (date - self.epoch) // app.config['RATING_PERIOD']
+
+    def cutoff(self):
+        now = datetime.datetime.utcnow() - app.config['RATING_PERIOD_GRACE']
+        return self.epoch + self.period(now) * app.config['RATING_PERIOD']
+
+    def initial_state(self, size):
+        return (np.full(size, 1500.0), np.full(size, self.initial_deviation),
+                np.full(size, app.config['GLICKO2_INITIAL_VOLATILITY']), np.full(size, -1, dtype=np.int64))
+
+    # Solves for each player's new volatility with the Illinois method,
+    # all players at once
+    def volatility(self, delta, phi, v, sigma, tolerance=1e-6):
+        tau = app.config['GLICKO2_TAU']
+        a = np.log(sigma ** 2)
+
+        def f(x):
+            ex = np.exp(x)
+            return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - a) / tau ** 2
+
+        lower = a.copy()
+        big = delta ** 2 > phi ** 2 + v
+        upper = np.where(big, np.log(np.where(big, delta ** 2 - phi ** 2 - v, 1)), a - tau)
+        f_upper = f(upper)
+        while (~big & (f_upper < 0)).any():
+            step = ~big & (f_upper < 0)
+            upper[step] -= tau
+            f_upper = f(upper)
+        f_lower = f(lower)
+        for _ in range(100):
+            active = np.abs(upper - lower) > tolerance
+            if not active.any():
+                break
+            middle = lower + (lower - upper) * f_lower / (f_upper - f_lower)
+            f_middle = f(middle)
+            swap = active & (f_middle * f_upper <= 0)
+            lower = np.where(swap, upper, lower)
+            f_lower = np.where(swap, f_upper, np.where(active, f_lower / 2, f_lower))
+            upper = np.where(active, middle, upper)
+            f_upper = np.where(active, f_middle, f_upper)
+        return np.exp(lower / 2)
+
+    # seats holds player indices into the state arrays, which are updated
+    # in place; returns the (n, 4) per-seat deltas and ratings after each
+    # game. Games must be ordered by period.
+    def rate_periods(self, seats, winning_teams, periods, state):
+        ratings, deviations, volatilities, last_periods = state
+        deltas = np.zeros(seats.shape)
+        after = np.zeros(seats.shape)
+        won = (np.asarray(winning_teams) == 1)[:, None] == np.array([True, True, False, False])
+        boundaries = np.flatnonzero(np.diff(periods)) + 1
+        for start, end in zip([0, *boundaries.tolist()], [*boundaries.tolist(), len(seats)]):
+            if start == end:
+                continue
+            period = int(periods[start])
+            batch = seats[start:end]
+            players = np.unique(batch)
+            # Deviations grow by the volatility for every period sat out
+            idle = np.where(last_periods[players] >= 0, np.maximum(period - last_periods[players] - 1, 0), 0)
+            deviations[players] = np.minimum(
+                np.sqrt(deviations[players] ** 2 + idle * (volatilities[players] * self.scale) ** 2),
+                self.initial_deviation)
+            mu = (ratings[batch] - 1500) / self.scale
+            phi = deviations[batch] / self.scale
+            team_mu = np.stack([mu[:, :2].mean(axis=1), mu[:, 2:].mean(axis=1)], axis=1)
+            team_phi = np.sqrt(np.stack([(phi[:, :2] ** 2).mean(axis=1), (phi[:, 2:] ** 2).mean(axis=1)], axis=1))
+            opponent = np.array([1, 1, 0, 0])
+            g = 1 / np.sqrt(1 + 3 * team_phi[:, opponent] ** 2 / np.pi ** 2)
+            expected = 1 / (1 + np.exp(-g * (mu - team_mu[:, opponent])))
+            surprise = g * (won[start:end] - expected)
+
+            flat = batch.ravel()
+            position = np.searchsorted(players, flat)
+            v = 1 / np.bincount(position, (g ** 2 * expected * (1 - expected)).ravel(), minlength=len(players))
+            total = np.bincount(position, surprise.ravel(), minlength=len(players))
+            player_phi = deviations[players] / self.scale
+            sigma = self.volatility(v * total, player_phi, v, volatilities[players])
+            new_phi = 1 / np.sqrt(1 / (player_phi ** 2 + sigma ** 2) + 1 / v)
+
+            # Every game's share of the update, and running totals per player
+            contributions = (self.scale * new_phi[position] ** 2 * surprise.ravel())
+            order = np.argsort(position, kind='stable')
+            running = np.cumsum(contributions[order])
+            first = np.r_[0, np.flatnonzero(np.diff(position[order])) + 1]
+            running -= np.repeat(running[first] - contributions[order][first], np.diff(np.r_[first, len(order)]))
+            totals = np.empty_like(running)
+            totals[order] = running
+            deltas[start:end] = contributions.reshape(batch.shape)
+            after[start:end] = (ratings[flat] + totals).reshape(batch.shape)
+
+            ratings[players] += np.bincount(position, contributions, minlength=len(players))
+            deviations[players] = new_phi * self.scale
+            volatilities[players] = sigma
+            last_periods[players] = period
+        return deltas, after
+
+    def periods(self, dates):
+        return np.array([self.period(date) for date in dates], dtype=np.int64)
+
+    def replay(self, seats, winning_teams, dates, size, initial_rating=1500.0):
+        state = self.initial_state(size)
+        state[0][:] = initial_rating
+        deltas, after = self.rate_periods(seats, winning_teams, self.periods(dates), state)
+        return state[0], np.bincount(seats.ravel(), minlength=size), deltas, after, state
+
+    def save_state(self, player_ids, state):
+        _, deviations, volatilities, last_periods = state
+        db.session.execute(GlickoState.__table__.delete())
+        rows = [(player_id, deviation, volatility, last_period) for player_id, deviation, volatility, last_period in zip(
+            player_ids.tolist(), deviations[player_ids].tolist(),
+            volatilities[player_ids].tolist(), last_periods[player_ids].tolist())]
+        if rows:
+            insert_rows(GlickoState, ['player_id', 'rating_deviation', 'volatility', 'last_period'], rows)
+        raise_counter('glicko_period', self.period(self.cutoff()))
+
+    # Games wait, processed but unrated, until their period and the grace
+    # after it are over; then every finished period is rated in one go.
+    # The 'glicko_period' counter holds the first period not yet rated, so
+    # the search for unrated games runs only once it falls behind. A game
+    # from a period already rated would otherwise be rated as a period of
+    # its own, so it replays the history instead, as removals do.
+    @timed
+    def apply(self, games):
+        closed = counter_value('glicko_period')
+        if any(self.period(row[1]) < closed for row in games):
+            rebuild_ratings(engine=self.name)
+        elif closed < self.period(self.cutoff()):
+            self.close_periods()
+        return len(games)
+
+    def close_periods(self):
+        cutoff = self.cutoff()
+        raise_counter('glicko_period', self.period(cutoff))
+        seats = [aliased(Player) for _ in PARTICIPANT_COLUMNS]
+        query = select(Game.id, Game.winning_team, Game.date_submitted, *[seat.id for seat in seats])
+        for seat, (_, _, column) in zip(seats, PARTICIPANT_COLUMNS):
+            query = query.join(seat, seat.id == column)
+        rows = db.session.execute(query.where(
+            Game.processed == True,
+            Game.date_submitted < cutoff,
+            ~exists().where(EloChange.game_id == Game.id),
+        ).order_by(Game.date_submitted, Game.id)).all()
+        if not rows:
+            return 0
+        player_ids = sorted({player_id for row in rows for player_id in row[3:]})
+        local = {player_id: index for index, player_id in enumerate(player_ids)}
+        state = self.initial_state(len(player_ids))
+        for player_id, rating, deviation, volatility, last_period in db.session.execute(
+            select(Player.id, Player.rating, GlickoState.rating_deviation,
+                   GlickoState.volatility, GlickoState.last_period)
+            .outerjoin(GlickoState, GlickoState.player_id == Player.id)
+            .where(Player.id.in_(player_ids))
+        ):
+            index = local[player_id]
+            state[0][index] = rating
+            if deviation is not None:
+                state[1][index], state[2][index], state[3][index] = deviation, volatility, last_period
+        seat_array = np.array([[local[player_id] for player_id in row[3:]] for row in rows], dtype=np.int64)
+        deltas, after = self.rate_periods(
+            seat_array, [row[1] for row in rows], self.periods([row[2] for row in rows]), state)
+
+        now = datetime.datetime.utcnow()
+        elo_changes = []
+        snapshots = []
+        for row, game_deltas, game_after in zip(rows, deltas.tolist(), after.tolist()):
+            for player_id, delta, rating in zip(row[3:], game_deltas, game_after):
+                elo_changes.append({'game_id': row[0], 'player_id': player_id, 'elo_change': delta})
+                snapshots.append({'player_id': player_id, 'game_id': row[0], 'rating_after': rating, 'ts': now})
+        played = np.bincount(seat_array.ravel(), minlength=len(player_ids))
+        players = Player.__table__
+        db.session.execute(
+            players.update().where(players.c.id == bindparam('player_id'))
+            .values(rating=bindparam('new_rating'), games_played=players.c.games_played + bindparam('played')),
+            [{'player_id': player_id, 'new_rating': rating, 'played': count}
+             for player_id, rating, count in zip(player_ids, state[0].tolist(), played.tolist())],
+        )
+        upsert = sqlite_insert(GlickoState)
+        db.session.execute(
+            upsert.on_conflict_do_update(index_elements=['player_id'], set_={
+                'rating_deviation': upsert.excluded.rating_deviation,
+                'volatility': upsert.excluded.volatility,
+                'last_period': upsert.excluded.last_period,
+            }),
+            [{'player_id': player_id, 'rating_deviation': deviation, 'volatility': volatility, 'last_period': last_period}
+             for player_id, deviation, volatility, last_period in zip(
+                 player_ids, state[1].tolist(), state[2].tolist(), state[3].tolist())],
+        )
+        db.session.execute(insert(EloChange), elo_changes)
+        db.session.execute(insert(RatingSnapshot), snapshots)
+        bump_ratings_version([(player_id, rating, None) for player_id, rating in zip(player_ids, state[0].tolist())])
+        return len(rows)
+
+RATING_ENGINES = {engine.name: engine for engine in (EloEngine(), Glicko2Engine())}
+
+def rating_engine(name=None):
+    return RATING_ENGINES[name or app.config['RATING_ENGINE']]
+
+def rebuild_ratings(chunk_size=50000, engine=None):
+    engine = rating_engine(engine)
+    query = select(Game.id, Game.team1_player1_id, Game.team1_player2_id,
+                   Game.team2_player1_id, Game.team2_player2_id, Game.winning_team, Game.date_submitted)
+    if engine.cutoff() is not None:
+        query = query.where(Game.date_submitted < engine.cutoff())
+    rows = db.session.execute(
+        query.where(Game.status == 'confirmed').order_by(Game.date_submitted, Game.id)
+    ).all()
+    player_ids = np.array(db.session.execute(select(Player.id)).scalars().all(), dtype=np.int64)
+    games = np.array([row[:6] for row in rows], dtype=np.int64).reshape(-1, 6)
+    dates = np.array([row[6].strftime(SQLITE_DATETIME_FORMAT) for row in rows], dtype=object)
+    game_ids = games[:, 0]
+    seats = games[:, 1:5]
+    start_ratings = season_start_ratings()
+    size = int(max(seats.max(initial=0), player_ids.max(initial=0), max(start_ratings, default=0))) + 1
+    initial = np.full(size, 1500.0)
+    initial[list(start_ratings)] = list(start_ratings.values())
+    ratings, games_played, deltas, after, state = engine.replay(
+        seats, games[:, 5], [row[6] for row in rows], size, initial)
+
+    # Write everything back in bulk
+    if len(player_ids):
+        db.session.execute(update(Player), [
+            {'id': player_id, 'rating': rating, 'games_played': played}
+            for player_id, rating, played in zip(
+                player_ids.tolist(), ratings[player_ids].tolist(), games_played[player_ids].tolist())
+        ])
+    engine.save_state(player_ids, state)
+    rebuild_stats()
+    db.session.execute(EloChange.__table__.delete())
+    existing = np.zeros(size, dtype=bool)
+    existing[player_ids] = True
+    keep = existing[seats].ravel()
+    change_game_ids = np.repeat(game_ids, 4)[keep].tolist()
+    change_player_ids = seats.ravel()[keep].tolist()
+    change_values = deltas.ravel()[keep].tolist()
+    change_after = after.ravel()[keep].tolist()
+    change_dates = np.repeat(dates, 4)[keep].tolist()
+    db.session.execute(RatingSnapshot.__table__.delete())
+    for start in range(0, len(change_values), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        insert_rows(EloChange, ['game_id', 'player_id', 'elo_change'], list(zip(
+            change_game_ids[chunk], change_player_ids[chunk], change_values[chunk])))
+        insert_rows(RatingSnapshot, ['player_id', 'game_id', 'rating_after', 'ts'], list(zip(
+            change_player_ids[chunk], change_game_ids[chunk], change_after[chunk], change_dates[chunk])))
+    db.session.execute(update(Game).where(Game.status == 'confirmed').values(processed=True))
+    bump_ratings_version()
+    db.session.commit()
+    return len(rows)
+
+# Seasons: rebuild_ratings replays the current season's games from these
+# starting ratings, and close_season moves the finished season out of the
+# live tables so they only ever hold the current season
+def current_season():
+    season = db.session.execute(select(Season).where(Season.closed_at.is_(None))).scalar_one_or_none()
+    if season is None:
+        started_at = db.session.execute(select(func.min(Game.date_submitted))).scalar()
+        season = Season(name='Season 1', started_at=started_at or datetime.datetime.utcnow())
+        db.session.add(season)
+        db.session.flush()
+    return season
+
+# Starting ratings for the current season of every player (or of the given
+# players) who finished the previous one; everyone else starts at 1500
+def season_start_ratings(player_ids=None):
+    previous = select(func.max(Season.id)).where(Season.closed_at.isnot(None)).scalar_subquery()
+    carry_over = db.session.execute(
+        select(Season.carry_over).where(Season.closed_at.is_(None))
+    ).scalar()
+    query = select(SeasonStanding.player_id, SeasonStanding.rating).where(SeasonStanding.season_id == previous)
+    if player_ids is not None:
+        query = query.where(SeasonStanding.player_id.in_(player_ids))
+    carry_over = 1.0 if carry_over is None else carry_over
+    return {player_id: 1500 + carry_over * (rating - 1500) for player_id, rating in db.session.execute(query)}
+
+# Closes the current season in one transaction: the final leaderboard goes
+# to SeasonStanding, the rated games move to the archive tables with their
+# ELO changes and snapshots, stats start over and ratings are pulled
+# towards 1500 by carry_over (1 keeps them, 0 is a hard reset). Games that
+# aren't rated yet (unconfirmed, or in an open Glicko-2 period) stay live
+# and count towards the new season. Glicko-2 deviations start over.
+def close_season(name, carry_over=1.0):
+    if not 0 <= carry_over <= 1:
+        raise ValueError('carry_over must be between 0 and 1.')
+    while drain_rating_queue():
+        pass
+    engine = rating_engine()
+    if not engine.incremental:
+        engine.close_periods()
+    cutoff = engine.cutoff()
+    closed_at = cutoff or datetime.datetime.utcnow()
+    season = current_season()
+    archived = [Game.processed == True]
+    if cutoff is not None:
+        archived.append(Game.date_submitted < cutoff)
+    game_ids = select(Game.id).where(*archived)
+
+    # Rows are copied in archive key order so the inserts append to the index
+    game_columns = [column.key for _, _, column in PARTICIPANT_COLUMNS] + ['winning_team', 'submitted_by', 'date_submitted']
+    moved = db.session.execute(insert(ArchivedGame).from_select(
+        ['season_id', 'id', *game_columns],
+        select(literal(season.id), Game.id, *[getattr(Game, column) for column in game_columns]).where(*archived),
+    )).rowcount
+    db.session.execute(insert(ArchivedEloChange).from_select(
+        ['season_id', 'game_id', 'player_id', 'elo_change'],
+        select(literal(season.id), EloChange.game_id, EloChange.player_id, EloChange.elo_change)
+        .where(EloChange.game_id.in_(game_ids)).order_by(EloChange.game_id, EloChange.player_id),
+    ))
+    db.session.execute(insert(ArchivedRatingSnapshot).from_select(
+        ['season_id', 'player_id', 'game_id', 'rating_after', 'ts'],
+        select(literal(season.id), RatingSnapshot.player_id, RatingSnapshot.game_id,
+               RatingSnapshot.rating_after, RatingSnapshot.ts)
+        .where(RatingSnapshot.game_id.in_(game_ids)).order_by(RatingSnapshot.player_id, RatingSnapshot.game_id),
+    ))
+
+    # Wins and losses come from the archived games themselves, since the
+    # live stats also count the games staying behind
+    games = int_array(db.session.execute(
+        select(*[getattr(ArchivedGame, column) for column in game_columns[:5]])
+        .where(ArchivedGame.season_id == season.id)
+    ), 5)
+    (players, wins, losses, _, _), _ = compute_stats(games[:, :4], games[:, 4])
+    records = dict(zip(players.tolist(), zip(wins.tolist(), losses.tolist())))
+    standings = db.session.execute(
+        select(Player.id, User.username, Player.rating, Player.games_played)
+        .join(User, User.id == Player.id).where(User.is_approved == True)
+        .order_by(Player.rating.desc(), Player.id.desc())
+    ).all()
+    if standings:
+        insert_rows(SeasonStanding, ['season_id', 'player_id', 'username', 'rank', 'rating', 'games_played',
+                                     'wins', 'losses'], [
+            (season.id, player_id, username, rank, rating, games_played, *records.get(player_id, (0, 0)))
+            for rank, (player_id, username, rating, games_played) in enumerate(standings, start=1)
+        ])
+
+    for model in (EloChange, RatingSnapshot, GameParticipant, GameConfirmation, RatingQueue):
+        delete_all_but(model.__table__, ~model.game_id.in_(game_ids))
+    delete_all_but(Game.__table__, ~and_(*archived))
+    players = Player.__table__
+    db.session.execute(players.update().values(rating=1500 + carry_over * (players.c.rating - 1500), games_played=0))
+    db.session.execute(GlickoState.__table__.delete())
+    rebuild_stats()
+    season.closed_at = closed_at
+    db.session.add(Season(name=name, started_at=closed_at, carry_over=carry_over))
+    bump_ratings_version()
+    db.session.commit()
+    return moved
+
+# Nearly every row goes when a season is archived, and SQLite empties a
+# table with an unqualified DELETE far faster than it deletes row by row
+# (index upkeep dominates), so the few rows that stay are set aside and
+# put back instead
+def delete_all_but(table, keep):
+    kept = db.session.execute(select(table).where(keep)).mappings().all()
+    db.session.execute(table.delete())
+    if kept:
+        db.session.execute(table.insert(), [dict(row) for row in kept])
+
+@app.cli.command('close-season')
+@click.argument('name')
+@click.option('--carry-over', type=click.FloatRange(0, 1), default=1.0, show_default=True,
+              help='Share of each rating\'s distance from 1500 kept into the new season.')
+def close_season_command(name, carry_over):
+    started = time.perf_counter()
+    moved = close_season(name, carry_over)
+    print(f'Archived {moved} games in {time.perf_counter() - started:.2f}s; {name} has started.')
+
+def game_seats(game):
+    return [getattr(game, column.key) for _, _, column in PARTICIPANT_COLUMNS]
+
+# A player's rating just before the game at key (date_submitted, id):
+# their stored rating minus every delta from that game onwards
+def rating_before(player_id, key):
+    later = tuple_(Game.date_submitted, Game.id) >= tuple_(*key)
+    player = db.session.get(Player, player_id)
+    if player is None:
+        # Deleted players keep their history but not their rating
+        earlier = db.session.execute(
+            select(func.coalesce(func.sum(EloChange.elo_change), 0.0))
+            .join(Game, Game.id == EloChange.game_id)
+            .where(EloChange.player_id == player_id, ~later)
+        ).scalar()
+        return season_start_ratings([player_id]).get(player_id, 1500.0) + earlier
+    since = db.session.execute(
+        select(func.coalesce(func.sum(EloChange.elo_change), 0.0))
+        .join(Game, Game.id == EloChange.game_id)
+        .where(EloChange.player_id == player_id, later)
+    ).scalar()
+    return player.rating - since
+
+# Incremental rerating for a processed game that is about to be removed:
+# only later games reachable from its players are replayed, and only the
+# EloChange rows whose value moves are rewritten
+def rerate_after_removal(removed, chunk_size=500):
+    cursor = (removed.date_submitted, removed.id)
+    removed_players = game_seats(removed)
+    affected = {player_id: rating_before(player_id, cursor) for player_id in removed_players}
+    snapshots = []
+    replayed = 0
+    while True:
+        reachable = select(GameParticipant.game_id).where(GameParticipant.user_id.in_(list(affected)))
+        games = Game.query.options(selectinload(Game.elo_changes)).filter(
+            Game.processed == True,
+            Game.id.in_(reachable),
+            tuple_(Game.date_submitted, Game.id) > tuple_(*cursor),
+        ).order_by(Game.date_submitted, Game.id).limit(chunk_size).all()
+        if not games:
+            break
+        for game in games:
+            cursor = (game.date_submitted, game.id)
+            replayed += 1
+            players = game_seats(game)
+            joined = [player_id for player_id in players if player_id not in affected]
+            for player_id in joined:
+                affected[player_id] = rating_before(player_id, cursor)
+            current = [affected[player_id] for player_id in players]
+            deltas = dict(zip(players, elo_deltas(current, game.winning_team)))
+            for player_id in players:
+                affected[player_id] += deltas[player_id]
+                snapshots.append({'snapshot_player': player_id, 'snapshot_game': game.id,
+                                  'rating_after': affected[player_id]})
+            for change in game.elo_changes:
+                if change.elo_change != deltas[change.player_id]:
+                    change.elo_change = deltas[change.player_id]
+            # The chunk was selected before these players joined, so their
+            # later games may be missing from it; fetch again from here
+            if joined:
+                break
+    if snapshots:
+        table = RatingSnapshot.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.player_id == bindparam('snapshot_player'), table.c.game_id == bindparam('snapshot_game'))
+            .values(rating_after=bindparam('rating_after')),
+            snapshots,
+        )
+    players = {p.id: p for p in Player.query.filter(Player.id.in_(list(affected)))}
+    for player_id, rating in affected.items():
+        if player_id in players:
+            players[player_id].rating = rating
+    for player_id in removed_players:
+        if player_id in players:
+            players[player_id].games_played -= 1
+    return {player_id: affected[player_id] for player_id in players}
+
+# Player stats: record_results folds newly processed games into
+# PlayerStats and PairStats; compute_stats derives both from scratch in
+# one vectorized pass, for rebuild_stats and the consistency check.
+def pair_results(seats, winning_team):
+    won = [winning_team == 1] * 2 + [winning_team == 2] * 2
+    for a in range(4):
+        for b in range(4):
+            if a != b:
+                yield seats[a], seats[b], a // 2 == b // 2, won[a]
+
+# games are (game_id, date_submitted, seats, winning_team) tuples. They are
+# folded in date order, the same order results_history uses; a player who
+# already has a processed game dated after one of these gets their streak
+# recomputed from history instead. With sign=-1 deleted games are taken
+# back out, and streaks are always recomputed.
+def record_results(games, sign=1):
+    if not games:
+        return
+    games = sorted(games, key=lambda game: (game[1], game[0]))
+    player_ids = {player_id for _, _, seats, _ in games for player_id in seats}
+    stats = {
+        row.player_id: [row.wins, row.losses, row.streak, row.longest_win_streak]
+        for row in db.session.execute(select(PlayerStats).where(PlayerStats.player_id.in_(player_ids))).scalars()
+    }
+    pairs = {}
+    for _, _, seats, winning_team in games:
+        for seat, player_id in enumerate(seats):
+            won = (seat < 2) == (winning_team == 1)
+            wins, losses, streak, longest = stats.get(player_id, [0, 0, 0, 0])
+            if sign < 0:
+                stats[player_id] = [wins - won, losses - (not won), streak, longest]
+            elif won:
+                streak = streak + 1 if streak > 0 else 1
+                stats[player_id] = [wins + 1, losses, streak, max(longest, streak)]
+            else:
+                stats[player_id] = [wins, losses + 1, streak - 1 if streak < 0 else -1, longest]
+        for a, b, partners, won in pair_results(seats, winning_team):
+            counts = pairs.setdefault((a, b), [0, 0, 0, 0])
+            counts[(0 if partners else 2) + (0 if won else 1)] += sign
+    upsert = sqlite_insert(PlayerStats)
+    db.session.execute(
+        upsert.on_conflict_do_update(index_elements=['player_id'], set_={
+            column: upsert.excluded[column] for column in ('wins', 'losses', 'streak', 'longest_win_streak')
+        }),
+        [{'player_id': player_id, 'wins': wins, 'losses': losses, 'streak': streak, 'longest_win_streak': longest}
+         for player_id, (wins, losses, streak, longest) in stats.items()],
+    )
+    upsert = sqlite_insert(PairStats)
+    db.session.execute(
+        upsert.on_conflict_do_update(index_elements=['player_a', 'player_b'], set_={
+            column: getattr(PairStats, column) + upsert.excluded[column] for column in PAIR_STATS_COLUMNS
+        }),
+        [{'player_a': a, 'player_b': b, **dict(zip(PAIR_STATS_COLUMNS, counts))} for (a, b), counts in pairs.items()],
+    )
+    if sign < 0:
+        refresh_streaks(player_ids)
+    else:
+        refresh_streaks(out_of_order_players(games))
+
+# Players with a processed game outside games dated after their first game
+# in it; the range scan only covers games newer than the oldest of them
+def out_of_order_players(games):
+    first = {}
+    for game_id, date_submitted, seats, _ in games:
+        for player_id in seats:
+            first.setdefault(player_id, (date_submitted, game_id))
+    game_ids = [game_id for game_id, _, _, _ in games]
+    rows = db.session.execute(
+        select(GameParticipant.user_id, Game.date_submitted, Game.id)
+        .join(GameParticipant, GameParticipant.game_id == Game.id)
+        .where(tuple_(Game.date_submitted, Game.id) > tuple_(*min(first.values())),
+               Game.id.not_in(game_ids), GameParticipant.user_id.in_(first),
+               Game.status == 'confirmed', Game.processed == True)
+    )
+    return {player_id for player_id, date_submitted, game_id in rows if (date_submitted, game_id) > first[player_id]}
+
+# Streaks recomputed from the processed history in date order
+def refresh_streaks(player_ids):
+    if not player_ids:
+        return
+    rows = db.session.execute(
+        select(GameParticipant.user_id, GameParticipant.team == Game.winning_team)
+        .join(Game, Game.id == GameParticipant.game_id)
+        .where(GameParticipant.user_id.in_(player_ids), Game.status == 'confirmed', Game.processed == True)
+        .order_by(GameParticipant.user_id, Game.date_submitted, Game.id)
+    )
+    streaks = {player_id: (0, 0) for player_id in player_ids}
+    for player_id, results in itertools.groupby(rows, key=lambda row: row[0]):
+        streak = longest = 0
+        for _, won in results:
+            if won:
+                streak = streak + 1 if streak > 0 else 1
+                longest = max(longest, streak)
+            else:
+                streak = streak - 1 if streak < 0 else -1
+        streaks[player_id] = (streak, longest)
+    player_stats = PlayerStats.__table__
+    db.session.execute(
+        player_stats.update().where(player_stats.c.player_id == bindparam('stats_player'))
+        .values(streak=bindparam('new_streak'), longest_win_streak=bindparam('new_longest')),
+        [{'stats_player': player_id, 'new_streak': streak, 'new_longest': longest}
+         for player_id, (streak, longest) in streaks.items()],
+    )
+
+# Integer result rows as an (n, width) array; np.array on Row objects goes
+# through a slow per-value key lookup
+def int_array(rows, width):
+    return np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64).reshape(-1, width)
+
+def results_history():
+    rows = db.session.execute(
+        select(*[column for _, _, column in PARTICIPANT_COLUMNS], Game.winning_team)
+        .where(Game.status == 'confirmed', Game.processed == True)
+        .order_by(Game.date_submitted, Game.id)
+    )
+    games = int_array(rows, 5)
+    return games[:, :4], games[:, 4]
+
+# Returns per-player (ids, wins, losses, streak, longest_win_streak) and
+# per-pair (player_a, player_b, partner_wins, partner_losses,
+# opponent_wins, opponent_losses) arrays, both sorted by id
+def compute_stats(seats, winning_teams):
+    won = (winning_teams == 1)[:, None] == np.array([True, True, False, False])
+    players, position = np.unique(seats.ravel(), return_inverse=True)
+    flat_won = won.ravel()
+    wins = np.bincount(position, flat_won, minlength=len(players)).astype(np.int64)
+    losses = np.bincount(position, ~flat_won, minlength=len(players)).astype(np.int64)
+    # Runs of equal results per player, in game order
+    order = np.argsort(position, kind='stable')
+    run_players = position[order]
+    run_results = flat_won[order]
+    # (sliced so an empty history gives no runs rather than one)
+    starts = np.r_[True, (run_players[1:] != run_players[:-1]) | (run_results[1:] != run_results[:-1])][:len(order)]
+    lengths = np.bincount(np.cumsum(starts) - 1)
+    run_players = run_players[starts]
+    run_results = run_results[starts]
+    last = np.r_[np.flatnonzero(run_players[1:] != run_players[:-1]), len(run_players) - 1][:len(players)]
+    streak = np.where(run_results[last], lengths[last], -lengths[last]) if len(players) else np.zeros(0, np.int64)
+    longest = np.zeros(len(players), dtype=np.int64)
+    np.maximum.at(longest, run_players[run_results], lengths[run_results])
+
+    firsts, seconds = zip(*[(a, b) for a in range(4) for b in range(4) if a != b])
+    a = seats[:, firsts].ravel()
+    b = seats[:, seconds].ravel()
+    pair_won = won[:, firsts].ravel()
+    partners = np.tile(np.array(firsts) // 2 == np.array(seconds) // 2, len(seats))
+    span = int(seats.max(initial=0)) + 1
+    keys, inverse = np.unique(a * span + b, return_inverse=True)
+    counts = np.stack([
+        np.bincount(inverse, partners & pair_won, minlength=len(keys)),
+        np.bincount(inverse, partners & ~pair_won, minlength=len(keys)),
+        np.bincount(inverse, ~partners & pair_won, minlength=len(keys)),
+        np.bincount(inverse, ~partners & ~pair_won, minlength=len(keys)),
+    ], axis=1).astype(np.int64)
+    return (players, wins, losses, streak, longest), (keys // span, keys % span, counts)
+
+def stored_player_ids():
+    return np.array(db.session.execute(select(Player.id).order_by(Player.id)).scalars().all(), dtype=np.int64)
+
+def rebuild_stats(chunk_size=50000):
+    (players, wins, losses, streak, longest), (pair_a, pair_b, counts) = compute_stats(*results_history())
+    # Deleted players keep their games but not their stats
+    existing = stored_player_ids()
+    keep = np.isin(players, existing)
+    player_rows = list(zip(*[array[keep].tolist() for array in (players, wins, losses, streak, longest)]))
+    keep = np.isin(pair_a, existing) & np.isin(pair_b, existing)
+    pair_rows = [(a, b, *row) for a, b, row in zip(pair_a[keep].tolist(), pair_b[keep].tolist(), counts[keep].tolist())]
+    db.session.execute(PlayerStats.__table__.delete())
+    db.session.execute(PairStats.__table__.delete())
+    for start in range(0, max(len(player_rows), len(pair_rows)), chunk_size):
+        if player_rows[start:start + chunk_size]:
+            insert_rows(PlayerStats, ['player_id', 'wins', 'losses', 'streak', 'longest_win_streak'],
+                        player_rows[start:start + chunk_size])
+        if pair_rows[start:start + chunk_size]:
+            insert_rows(PairStats, ['player_a', 'player_b', *PAIR_STATS_COLUMNS], pair_rows[start:start + chunk_size])
+    return len(player_rows), len(pair_rows)
+
+# Consistency check: compares the stored stats with a fresh compute_stats
+# and returns the players and pairs whose rows differ or are missing
+def check_stats():
+    (players, *player_values), (pair_a, pair_b, counts) = compute_stats(*results_history())
+    existing = stored_player_ids()
+    keep = np.isin(players, existing)
+    expected = {
+        'players': (players[keep], np.stack(player_values, axis=1)[keep]),
+    }
+    keep = np.isin(pair_a, existing) & np.isin(pair_b, existing)
+    span = int(max(pair_a.max(initial=0), pair_b.max(initial=0), existing.max(initial=0))) + 1
+    expected['pairs'] = (pair_a[keep] * span + pair_b[keep], counts[keep])
+    stored = {
+        'players': db.session.execute(
+            select(PlayerStats.player_id, PlayerStats.wins, PlayerStats.losses,
+                   PlayerStats.streak, PlayerStats.longest_win_streak)),
+        'pairs': db.session.execute(
+            select(PairStats.player_a * span + PairStats.player_b,
+                   *[getattr(PairStats, column) for column in PAIR_STATS_COLUMNS])),
+    }
+    drift = {}
+    for name, (keys, values) in expected.items():
+        rows = int_array(stored[name], values.shape[1] + 1)
+        # Players with no games have no row, or an all-zero one
+        rows = rows[(rows[:, 1:] != 0).any(axis=1)]
+        all_keys = np.union1d(keys, rows[:, 0])
+        table = np.zeros((2, len(all_keys), values.shape[1]), dtype=np.int64)
+        table[0, np.searchsorted(all_keys, keys)] = values
+        table[1, np.searchsorted(all_keys, rows[:, 0])] = rows[:, 1:]
+        different = all_keys[(table[0] != table[1]).any(axis=1)]
+        drift[name] = different.tolist() if name == 'players' else [divmod(key, span) for key in different.tolist()]
+    return drift
+
+@app.cli.command('check-stats')
+@click.option('--fix', is_flag=True, help='Rebuild the stats tables from history if they have drifted.')
+def check_stats_command(fix):
+    drift = check_stats()
+    print(f'{len(drift["players"])} players and {len(drift["pairs"])} pairs differ from history.')
+    for player_id in drift['players'][:20]:
+        print(f'  player {player_id}')
+    for a, b in drift['pairs'][:20]:
+        print(f'  pair {a}/{b}')
+    if fix and (drift['players'] or drift['pairs']):
+        players, pairs = rebuild_stats()
+        db.session.commit()
+        print(f'Rebuilt stats for {players} players and {pairs} pairs.')
+
+@app.cli.command('rebuild-ratings')
+@click.option('--engine', type=click.Choice(sorted(RATING_ENGINES)), help='Defaults to RATING_ENGINE.')
+def rebuild_ratings_command(engine):
+    started = time.perf_counter()
+    replayed = rebuild_ratings(engine=engine)
+    print(f'Replayed {replayed} games in {time.perf_counter() - started:.2f}s.')
+
+@app.cli.command('close-rating-periods')
+def close_rating_periods_command():
+    engine = rating_engine()
+    if engine.incremental:
+        print(f'The {engine.name} engine rates games as they are confirmed; nothing to close.')
+        return
+    rated = engine.close_periods()
+    db.session.commit()
+    print(f'Rated {rated} games from finished rating periods.')
+
+# Bulk game import from CSV or JSONL. Each record names the four players by
+# username (team1_player1, team1_player2, team2_player1, team2_player2)
+# plus winning_team and an optional ISO date_submitted. Games are applied
+# in file order as confirmed games; if that isn't date order, or a game
+# predates ones already rated, the history is replayed once at the end.
+IMPORT_FIELDS = ('team1_player1', 'team1_player2', 'team2_player1', 'team2_player2')
+
+ImportResult = namedtuple('ImportResult', ['imported', 'skipped', 'rows_done', 'seconds'])
+
+def read_game_records(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+# Returns (seats, winning_team, date_submitted), or None for a record to
+# skip. Dates with a UTC offset are stored as naive UTC like the rest.
+def parse_game_record(record, user_ids):
+    if not isinstance(record, dict):
+        return None
+    seats = [user_ids.get(str(record.get(field) or '').strip().lower()) for field in IMPORT_FIELDS]
+    winning_team = str(record.get('winning_team') or '').strip()
+    if None in seats or len(set(seats)) < 4 or winning_team not in ('1', '2'):
+        return None
+    date_submitted = record.get('date_submitted')
+    try:
+        date_submitted = datetime.datetime.fromisoformat(date_submitted) if date_submitted else datetime.datetime.utcnow()
+    except (TypeError, ValueError):
+        return None
+    if date_submitted.tzinfo is not None:
+        date_submitted = date_submitted.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return seats, int(winning_team), date_submitted
+
+# Inserts one batch of parsed games and applies their ratings in memory,
+# writing each touched player once
+def import_game_batch(games, submitted_by):
+    player_ids = {player_id for seats, _, _ in games for player_id in seats}
+    players = {
+        player_id: [rating, games_played]
+        for player_id, rating, games_played in db.session.execute(
+            select(Player.id, Player.rating, Player.games_played).where(Player.id.in_(player_ids)))
+    }
+    game_ids = db.session.execute(
+        insert(Game).returning(Game.id, sort_by_parameter_order=True),
+        [
+            dict(zip(('team1_player1_id', 'team1_player2_id', 'team2_player1_id', 'team2_player2_id'), seats),
+                 winning_team=winning_team, date_submitted=date_submitted, submitted_by=submitted_by,
+                 confirmations=4, status='confirmed', processed=True)
+            for seats, winning_team, date_submitted in games
+        ],
+    ).scalars().all()
+    db.session.execute(insert(GameParticipant), [
+        {'game_id': game_id, 'user_id': player_id, 'team': team, 'slot': slot}
+        for game_id, (seats, _, _) in zip(game_ids, games)
+        for (team, slot, _), player_id in zip(PARTICIPANT_COLUMNS, seats)
+    ])
+    record_results([(game_id, date_submitted, seats, winning_team)
+                    for game_id, (seats, winning_team, date_submitted) in zip(game_ids, games)])
+    if not rating_engine().incremental:
+        # import_games replays the whole history once every batch is in
+        return
+    elo_changes = []
+    snapshots = []
+    for game_id, (seats, winning_team, date_submitted) in zip(game_ids, games):
+        current = [players[player_id][0] for player_id in seats]
+        deltas = elo_deltas(current, winning_team)
+        for player_id, delta in zip(seats, deltas):
+            players[player_id][0] += delta
+            players[player_id][1] += 1
+            elo_changes.append({'game_id': game_id, 'player_id': player_id, 'elo_change': delta})
+            snapshots.append({'player_id': player_id, 'game_id': game_id,
+                              'rating_after': players[player_id][0], 'ts': date_submitted})
+    db.session.execute(insert(EloChange), elo_changes)
+    db.session.execute(insert(RatingSnapshot), snapshots)
+    db.session.execute(update(Player), [
+        {'id': player_id, 'rating': rating, 'games_played': games_played}
+        for player_id, (rating, games_played) in players.items()
+    ])
+
+# Resume key for an import: the label plus a hash of the file, so a new
+# file under an old name is a new import. Rewinds the binary stream.
+def import_job_name(label, stream):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1 << 20), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return f'{label}:{digest.hexdigest()[:16]}'
+
+def import_games(records, job_name, submitted_by, batch_size=5000, progress=None):
+    job = db.session.get(ImportJob, job_name)
+    if job is None:
+        job = ImportJob(name=job_name, rows_done=0, games_imported=0)
+        db.session.add(job)
+        db.session.commit()
+    # One lookup map for every username in the import
+    user_ids = dict(db.session.execute(
+        select(User.username, User.id).join(Player, Player.id == User.id).where(User.is_approved == True)
+    ).all())
+    records = itertools.islice(records, job.rows_done, None)
+    # A resumed job may have rated back-dated batches before it stopped
+    back_dated = job.rows_done > 0
+    newest = db.session.execute(select(func.max(Game.date_submitted)).where(Game.processed == True)).scalar()
+    started = time.perf_counter()
+    imported = skipped = 0
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        games = [game for game in (parse_game_record(record, user_ids) for record in batch) if game]
+        for _, _, date_submitted in games:
+            back_dated = back_dated or (newest is not None and date_submitted < newest)
+            newest = date_submitted if newest is None else max(newest, date_submitted)
+        if games:
+            import_game_batch(games, submitted_by)
+            bump_ratings_version()
+        job.rows_done += len(batch)
+        job.games_imported += len(games)
+        db.session.commit()
+        imported += len(games)
+        skipped += len(batch) - len(games)
+        if progress:
+            progress(ImportResult(imported, skipped, job.rows_done, time.perf_counter() - started))
+    rows_done = job.rows_done
+    db.session.delete(job)
+    db.session.commit()
+    # Ratings follow date order everywhere else, so back-dated games are
+    # rated by a replay; so is every import for engines that rate in
+    # periods, since imported games usually predate periods already rated
+    if imported and (back_dated or not rating_engine().incremental):
+        rebuild_ratings()
+    return ImportResult(imported, skipped, rows_done, time.perf_counter() - started)
+
+@app.cli.command('import-games')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=5000, show_default=True)
+@click.option('--job', 'job_name', help='Resume key; defaults to the file path and a hash of its contents.')
+@click.option('--restart', is_flag=True, help='Ignore the progress of a previous run.')
+def import_games_command(path, fmt, batch_size, job_name, restart):
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    if not job_name:
+        with open(path, 'rb') as raw:
+            job_name = import_job_name(path, raw)
+    if restart:
+        ImportJob.query.filter_by(name=job_name).delete()
+        db.session.commit()
+    admin = User.query.filter_by(is_admin=True).order_by(User.id).first()
+
+    def report(result):
+        rate = result.imported / result.seconds if result.seconds else 0
+        print(f'{result.rows_done} rows read, {result.imported} games imported, '
+              f'{result.skipped} skipped ({rate:.0f} games/s)')
+
+    with open(path, newline='', encoding='utf-8') as stream:
+        result = import_games(read_game_records(stream, fmt), job_name, admin.id, batch_size, report)
+    print(f'Done: {result.imported} games imported, {result.skipped} skipped in {result.seconds:.2f}s.')
+
+# Streaming export: each export is one joined query read in yield_per
+# chunks, encoded chunk by chunk (and gzipped on the fly if asked), so
+# memory stays flat however big the database is. Game exports use the
+# import column names, so an export can be imported elsewhere.
+GAME_EXPORT_COLUMNS = ('id', 'date_submitted', *IMPORT_FIELDS, 'winning_team',
+                       *[f'{field}_delta' for field in IMPORT_FIELDS])
+HISTORY_EXPORT_COLUMNS = ('player_id', 'username', 'game_id', 'ts', 'rating_after', 'elo_change')
+
+def export_games_query():
+    query = select(Game.id, Game.date_submitted)
+    users = [aliased(User) for _ in PARTICIPANT_COLUMNS]
+    changes = [aliased(EloChange) for _ in PARTICIPANT_COLUMNS]
+    for user, change, (_, _, column) in zip(users, changes, PARTICIPANT_COLUMNS):
+        query = query.outerjoin(user, user.id == column) \
+            .outerjoin(change, and_(change.game_id == Game.id, change.player_id == column))
+    return query.add_columns(*[user.username for user in users], Game.winning_team,
+                             *[change.elo_change for change in changes]) \
+        .where(Game.status == 'confirmed').order_by(Game.date_submitted, Game.id)
+
+def export_history_query():
+    return select(RatingSnapshot.player_id, User.username, RatingSnapshot.game_id, RatingSnapshot.ts,
+                  RatingSnapshot.rating_after, EloChange.elo_change) \
+        .outerjoin(User, User.id == RatingSnapshot.player_id) \
+        .outerjoin(EloChange, and_(EloChange.game_id == RatingSnapshot.game_id,
+                                   EloChange.player_id == RatingSnapshot.player_id)) \
+        .order_by(RatingSnapshot.player_id, RatingSnapshot.ts, RatingSnapshot.game_id)
+
+EXPORTS = {
+    'games': (GAME_EXPORT_COLUMNS, export_games_query),
+    'history': (HISTORY_EXPORT_COLUMNS, export_history_query),
+}
+
+def export_chunks(kind, fmt, compress=False, batch_size=1000):
+    columns, query = EXPORTS[kind]
+    # wbits=31 writes a gzip container rather than a bare zlib stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    result = db.session.execute(query().execution_options(yield_per=batch_size))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(columns)
+    for rows in result.partitions():
+        if fmt == 'csv':
+            writer.writerows(
+                [value.isoformat() if isinstance(value, datetime.datetime) else value for value in row] for row in rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(columns, row)), default=datetime.datetime.isoformat) + '\n')
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.argument('output', type=click.File('wb'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--gzip', 'compress', is_flag=True, help='Defaults to on for .gz files.')
+@click.option('--batch-size', default=1000, show_default=True)
+def export_command(kind, output, fmt, compress, batch_size):
+    name = output.name.lower() if isinstance(output.name, str) else ''
+    compress = compress or name.endswith('.gz')
+    fmt = fmt or ('jsonl' if name.removesuffix('.gz').endswith(('.jsonl', '.json')) else 'csv')
+    started = time.perf_counter()
+    written = 0
+    for chunk in export_chunks(kind, fmt, compress, batch_size):
+        output.write(chunk)
+        written += len(chunk)
+    click.echo(f'Exported {kind} ({written} bytes) in {time.perf_counter() - started:.2f}s.', err=True)
+
+LeaderboardRow = namedtuple('LeaderboardRow', ['rank', 'id', 'username', 'rating', 'games_played'])
+
+# Leaderboard cache: holds the ranked rows and the rendered table for each
+# page, and throws both away only when the ratings version changes
+class LeaderboardCache:
+    max_fragments = 256
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.rows = []
+        self.keys = []
+        self.fragments = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, version):
+        with self.lock:
+            if self.version is None or version > self.version:
+                query = db.session.query(Player.id, User.username, Player.rating, Player.games_played) \
+                    .join(User, User.id == Player.id).filter(User.is_approved == True) \
+                    .order_by(Player.rating.desc(), Player.id.desc())
+                self.rows = [LeaderboardRow(rank, *row) for rank, row in enumerate(query, start=1)]
+                # Ascending keys for bisect over the descending (rating, id) order
+                self.keys = [(-row.rating, -row.id) for row in self.rows]
+                self.fragments = {}
+                self.version = version
+            return self.rows, self.keys
+
+    def fragment(self, version, key, render):
+        with self.lock:
+            if self.version == version and key in self.fragments:
+                self.hits += 1
+                return self.fragments[key]
+            self.misses += 1
+        html = render()
+        with self.lock:
+            if self.version == version:
+                if len(self.fragments) >= self.max_fragments:
+                    self.fragments.clear()
+                self.fragments[key] = html
+        return html
+
+    def stats(self):
+        return {'version': self.version, 'hits': self.hits, 'misses': self.misses}
+
+leaderboard_cache = LeaderboardCache()
+
+# Player search index: approved usernames sorted case-insensitively, so a
+# prefix search is a bisect plus a short scan. Rebuilt only when the
+# players version changes.
+class PlayerSearchIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.keys = []
+        self.players = []
+        self.by_name = {}
+
+    def load(self, version):
+        with self.lock:
+            if self.version is None or version > self.version:
+                rows = db.session.execute(
+                    select(User.username, User.id).join(Player, Player.id == User.id).where(User.is_approved == True)
+                ).all()
+                rows.sort(key=lambda row: (row.username.casefold(), row.id))
+                self.keys = [row.username.casefold() for row in rows]
+                self.players = [{'id': row.id, 'username': row.username} for row in rows]
+                self.by_name = {key: player['id'] for key, player in zip(self.keys, self.players)}
+                self.version = version
+            return self.keys, self.players
+
+    def search(self, version, prefix, limit=10):
+        keys, players = self.load(version)
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and end - start < limit and keys[end].startswith(prefix):
+            end += 1
+        return players[start:end]
+
+    def lookup(self, version, username):
+        self.load(version)
+        return self.by_name.get(username.casefold())
+
+player_search = PlayerSearchIndex()
+
+RankEntry = namedtuple('RankEntry', ['rank', 'id', 'username', 'rating'])
+
+# Rank index: an order-statistic index over the approved players, in
+# leaderboard order (rating, then id, descending). Players sit in one-point
+# rating buckets kept in sorted order, and a Fenwick tree over the bucket
+# sizes counts everyone rated above a bucket, so rank-of-player and
+# player-at-rank are both logarithmic. Committed rating changes are applied
+# in place (see bump_ratings_version); if the index has missed a version it
+# reloads from the database instead.
+class RankIndex:
+    buckets = 5000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.players = {}
+        self.slots = []
+        self.tree = []
+
+    # Bucket 0 holds the highest ratings; outliers share the end buckets
+    def slot(self, rating):
+        return self.buckets - 1 - min(max(int(rating), 0), self.buckets - 1)
+
+    def add(self, slot, delta):
+        slot += 1
+        while slot <= self.buckets:
+            self.tree[slot] += delta
+            slot += slot & -slot
+
+    # Players in the buckets before slot
+    def above(self, slot):
+        total = 0
+        while slot > 0:
+            total += self.tree[slot]
+            slot -= slot & -slot
+        return total
+
+    def insert(self, player_id, rating, username):
+        self.players[player_id] = (rating, username)
+        slot = self.slot(rating)
+        bisect.insort(self.slots[slot], (-rating, -player_id))
+        self.add(slot, 1)
+
+    def remove(self, player_id):
+        rating, username = self.players.pop(player_id)
+        slot = self.slot(rating)
+        entries = self.slots[slot]
+        del entries[bisect.bisect_left(entries, (-rating, -player_id))]
+        self.add(slot, -1)
+        return username
+
+    def load(self, version):
+        rows = db.session.execute(
+            select(Player.id, Player.rating, User.username).join(User, User.id == Player.id)
+            .where(User.is_approved == True)
+        ).all()
+        self.players = {player_id: (rating, username) for player_id, rating, username in rows}
+        self.slots = [[] for _ in range(self.buckets)]
+        for player_id, rating, _ in rows:
+            self.slots[self.slot(rating)].append((-rating, -player_id))
+        self.tree = [0] * (self.buckets + 1)
+        for slot, entries in enumerate(self.slots, start=1):
+            entries.sort()
+            self.tree[slot] += len(entries)
+            parent = slot + (slot & -slot)
+            if parent <= self.buckets:
+                self.tree[parent] += self.tree[slot]
+        self.version = version
+
+    def apply(self, base, version, changes):
+        with self.lock:
+            if self.version != base or changes is None:
+                return
+            for player_id, rating, username in changes:
+                if player_id in self.players:
+                    known = self.remove(player_id)
+                    username = username or known
+                if rating is not None and username is not None:
+                    self.insert(player_id, rating, username)
+            self.version = version
+
+    def position(self, version, player_id):
+        if self.version != version:
+            self.load(version)
+        if player_id not in self.players:
+            return None
+        rating, _ = self.players[player_id]
+        slot = self.slot(rating)
+        return self.above(slot) + bisect.bisect_left(self.slots[slot], (-rating, -player_id)) + 1
+
+    def rank(self, version, player_id):
+        with self.lock:
+            return self.position(version, player_id)
+
+    def entry(self, rank):
+        slot = 0
+        step = 1 << (self.buckets.bit_length() - 1)
+        remaining = rank
+        while step:
+            if slot + step <= self.buckets and self.tree[slot + step] < remaining:
+                slot += step
+                remaining -= self.tree[slot]
+            step >>= 1
+        rating, player_id = self.slots[slot][remaining - 1]
+        return RankEntry(rank, -player_id, self.players[-player_id][1], -rating)
+
+    # The players ranked within radius places of player_id
+    def around(self, version, player_id, radius=2):
+        with self.lock:
+            rank = self.position(version, player_id)
+            if rank is None:
+                return None, []
+            ranks = range(max(rank - radius, 1), min(rank + radius, len(self.players)) + 1)
+            return rank, [self.entry(neighbour) for neighbour in ranks]
+
+rank_index = RankIndex()
+
+# Keyset pagination over the cached ranked rows, mirroring keyset_paginate
+def leaderboard_page(rows, keys, page_size=None):
+    page_size = page_size or app.config['PAGE_SIZE']
+    before = decode_cursor(request.args.get('before'), [float, int])
+    after = decode_cursor(request.args.get('after'), [float, int])
+    if before is not None:
+        end = bisect.bisect_left(keys, (-before[0], -before[1]))
+        start = max(end - page_size, 0)
+    else:
+        start = bisect.bisect_right(keys, (-after[0], -after[1])) if after is not None else 0
+        end = start + page_size
+    items = rows[start:end]
+    if not items:
+        return Page(items, None, None)
+    next_cursor = encode_cursor([items[-1].rating, items[-1].id]) if end < len(rows) else None
+    prev_cursor = encode_cursor([items[0].rating, items[0].id]) if start > 0 else None
+    return Page(items, next_cursor, prev_cursor)
+
+# Each player's last SPARKLINE_GAMES ratings, oldest first, in one
+# statement: a UNION ALL of one short index seek per player
+def recent_ratings(player_ids):
+    if not player_ids:
+        return {}
+    recent = [
+        select(RatingSnapshot.player_id, RatingSnapshot.rating_after)
+        .where(RatingSnapshot.player_id == player_id)
+        .order_by(RatingSnapshot.ts.desc(), RatingSnapshot.game_id.desc())
+        .limit(app.config['SPARKLINE_GAMES']).subquery()
+        for player_id in player_ids
+    ]
+    ratings = {}
+    for player_id, rating in db.session.execute(union_all(*[select(*query.c) for query in recent])):
+        ratings.setdefault(player_id, []).append(rating)
+    return {player_id: values[::-1] for player_id, values in ratings.items()}
+
+# SVG polyline points for a 100x20 sparkline, games evenly spaced
+def sparkline_points(values):
+    if len(values) < 2:
+        return None
+    low = min(values)
+    span = (max(values) - low) or 1
+    return ' '.join(
+        f'{index * 100 / (len(values) - 1):.1f},{19 - (value - low) / span * 18:.1f}'
+        for index, value in enumerate(values)
+    )
+
+# Leaderboard Route
+@app.route('/leaderboard')
+def leaderboard():
+    version = ratings_version()
+    key = (request.args.get('after'), request.args.get('before'))
+
+    def render_table():
+        rows, keys = leaderboard_cache.load(version)
+        page = leaderboard_page(rows, keys)
+        sparklines = {
+            player_id: sparkline_points(ratings)
+            for player_id, ratings in recent_ratings([row.id for row in page.items]).items()
+        }
+        return Markup(render_template('leaderboard_table.html', players=page.items, page=page,
+                                      sparklines=sparklines))
+
+    table = leaderboard_cache.fragment(version, key, render_table)
+    return render_template('leaderboard.html', table=table)
+
+# Leaderboard API Route: the ETag is the ratings version, so a poll that
+# matches is answered with 304 from the counter row alone
+@app.route('/api/leaderboard')
+def api_leaderboard():
+    fields = request.args.get('fields')
+    fields = fields.split(',') if fields else list(LeaderboardRow._fields)
+    unknown = set(fields) - set(LeaderboardRow._fields)
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+    limit = min(max(request.args.get('limit', app.config['PAGE_SIZE'], type=int), 1), 500)
+    version = ratings_version()
+    etag = f'leaderboard-{version}'
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        rows, keys = leaderboard_cache.load(version)
+        page = leaderboard_page(rows, keys, limit)
+        args = {'limit': limit}
+        if request.args.get('fields'):
+            args['fields'] = request.args['fields']
+        response = jsonify({
+            'version': version,
+            'players': [{field: getattr(row, field) for field in fields} for row in page.items],
+            'next': url_for('api_leaderboard', after=page.next_cursor, **args) if page.next_cursor else None,
+            'prev': url_for('api_leaderboard', before=page.prev_cursor, **args) if page.prev_cursor else None,
+        })
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['LEADERBOARD_API_MAX_AGE']
+    return response
+
+# Largest-Triangle-Three-Buckets: keeps the first and last points and, from
+# each bucket in between, the point forming the largest triangle with the
+# previously kept point and the next bucket's average, so peaks survive
+def downsample_lttb(xs, ys, threshold):
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int).tolist()
+    kept = [0]
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = xs[end:next_end].mean() if next_end > end else xs[-1]
+        next_y = ys[end:next_end].mean() if next_end > end else ys[-1]
+        anchor_x, anchor_y = xs[kept[-1]], ys[kept[-1]]
+        areas = np.abs((anchor_x - next_x) * (ys[start:end] - anchor_y) - (anchor_x - xs[start:end]) * (next_y - anchor_y))
+        kept.append(start + int(areas.argmax()))
+    kept.append(n - 1)
+    return kept
+
+# Player Rating History Route
+@app.route('/player/<int:player_id>/history')
+def player_history(player_id):
+    player = db.session.get(Player, player_id)
+    if player is None:
+        abort(404)
+    points = min(max(request.args.get('points', 200, type=int), 3), 1000)
+    rows = db.session.execute(
+        select(RatingSnapshot.ts, RatingSnapshot.rating_after)
+        .where(RatingSnapshot.player_id == player_id)
+        .order_by(RatingSnapshot.ts, RatingSnapshot.game_id)
+    ).all()
+    # Games are evenly spaced on the x axis so bursts of play aren't squashed
+    ys = np.array([rating for _, rating in rows], dtype=np.float64)
+    kept = downsample_lttb(np.arange(len(rows), dtype=np.float64), ys, points)
+    return jsonify({
+        'player_id': player_id,
+        'username': player.user.username,
+        'rank': rank_index.rank(ratings_version(), player_id),
+        'games': len(rows),
+        'points': [[rows[index][0].isoformat(), round(rows[index][1], 2)] for index in kept],
+    })
+
+# Rank Route: a player's rank and the players ranked around them, from the
+# rank index rather than the full leaderboard
+@app.route('/api/players/<int:player_id>/rank')
+def api_player_rank(player_id):
+    radius = min(max(request.args.get('radius', 2, type=int), 0), 50)
+    rank, neighbours = rank_index.around(ratings_version(), player_id, radius)
+    if rank is None:
+        return jsonify({'error': 'Player is not ranked.'}), 404
+    return jsonify({
+        'player_id': player_id,
+        'rank': rank,
+        'neighbours': [entry._asdict() for entry in neighbours],
+    })
+
+# Player Profile Route: reads the denormalized stats, never the games
+@app.route('/player/<int:player_id>')
+def player_profile(player_id):
+    row = db.session.execute(
+        select(Player, User.username).join(User, User.id == Player.id).where(Player.id == player_id)
+    ).first()
+    if row is None:
+        abort(404)
+    player, username = row
+    stats = db.session.get(PlayerStats, player_id) or PlayerStats(wins=0, losses=0, streak=0, longest_win_streak=0)
+    partner_games = PairStats.partner_wins + PairStats.partner_losses
+    opponent_games = PairStats.opponent_wins + PairStats.opponent_losses
+    pairs = select(PairStats, User.username).join(User, User.id == PairStats.player_b) \
+        .where(PairStats.player_a == player_id)
+    minimum = app.config['PROFILE_MIN_PAIR_GAMES']
+    best_partner = db.session.execute(
+        pairs.where(partner_games >= minimum)
+        .order_by((PairStats.partner_wins * 1.0 / partner_games).desc(), partner_games.desc()).limit(1)
+    ).first()
+    nemesis = db.session.execute(
+        pairs.where(opponent_games >= minimum)
+        .order_by((PairStats.opponent_losses * 1.0 / opponent_games).desc(), opponent_games.desc()).limit(1)
+    ).first()
+    partners = db.session.execute(pairs.where(partner_games > 0).order_by(partner_games.desc()).limit(10)).all()
+    opponents = db.session.execute(pairs.where(opponent_games > 0).order_by(opponent_games.desc()).limit(10)).all()
+    rank = rank_index.rank(ratings_version(), player_id)
+    seasons = db.session.execute(
+        select(Season.id, Season.name, SeasonStanding.rank, SeasonStanding.rating,
+               SeasonStanding.wins, SeasonStanding.losses)
+        .join(Season, Season.id == SeasonStanding.season_id)
+        .where(SeasonStanding.player_id == player_id).order_by(Season.id.desc())
+    ).all()
+    return render_template('player_profile.html', player=player, username=username, rank=rank, stats=stats,
+                           best_partner=best_partner, nemesis=nemesis, partners=partners, opponents=opponents,
+                           seasons=seasons)
+
+# Seasons Routes: closed seasons are read from SeasonStanding and the
+# archive tables only
+@app.route('/seasons')
+def seasons():
+    seasons = Season.query.order_by(Season.id.desc()).all()
+    return render_template('seasons.html', seasons=seasons)
+
+def closed_season(season_id):
+    season = db.session.get(Season, season_id)
+    if season is None or season.closed_at is None:
+        abort(404)
+    return season
+
+@app.route('/seasons/<int:season_id>')
+def season_standings(season_id):
+    season = closed_season(season_id)
+    page = keyset_paginate(SeasonStanding.query.filter_by(season_id=season_id),
+                           [SeasonStanding.rating, SeasonStanding.player_id], [float, int])
+    return render_template('season_standings.html', season=season, standings=page.items, page=page)
+
+@app.route('/seasons/<int:season_id>/games')
+def season_games(season_id):
+    season = closed_season(season_id)
+    page = keyset_paginate(ArchivedGame.query.filter_by(season_id=season_id),
+                           [ArchivedGame.date_submitted, ArchivedGame.id], [datetime.datetime.fromisoformat, int])
+    game_ids = [game.id for game in page.items]
+    player_ids = {getattr(game, column.key) for game in page.items for _, _, column in PARTICIPANT_COLUMNS}
+    names = dict(db.session.execute(
+        select(SeasonStanding.player_id, SeasonStanding.username)
+        .where(SeasonStanding.season_id == season_id, SeasonStanding.player_id.in_(player_ids))
+    ).all())
+    changes = {}
+    for game_id, player_id, elo_change in db.session.execute(
+        select(ArchivedEloChange.game_id, ArchivedEloChange.player_id, ArchivedEloChange.elo_change)
+        .where(ArchivedEloChange.season_id == season_id, ArchivedEloChange.game_id.in_(game_ids))
+    ):
+        changes.setdefault(game_id, []).append((player_id, elo_change))
+    return render_template('season_games.html', season=season, games=page.items, page=page,
+                           names=names, changes=changes)
+
+# What-if Route: rates many hypothetical 2v2 matchups against the current
+# ratings in one elo_kernel call per outcome. Nothing is stored.
+@app.route('/api/what_if', methods=['POST'])
+@login_required(api=True)
+def api_what_if():
+    payload = request.get_json(silent=True) or {}
+    matchups = payload.get('matchups')
+    if not isinstance(matchups, list) or not matchups:
+        return jsonify({'error': 'matchups must be a non-empty list.'}), 400
+    if len(matchups) > app.config['WHAT_IF_MAX_MATCHUPS']:
+        return jsonify({'error': 'At most %d matchups per request.' % app.config['WHAT_IF_MAX_MATCHUPS']}), 400
+    seats = []
+    for matchup in matchups:
+        team1 = matchup.get('team1') if isinstance(matchup, dict) else None
+        team2 = matchup.get('team2') if isinstance(matchup, dict) else None
+        if not (isinstance(team1, list) and isinstance(team2, list) and len(team1) == len(team2) == 2
+                and all(isinstance(player_id, int) for player_id in team1 + team2)
+                and len(set(team1 + team2)) == 4):
+            return jsonify({'error': 'Each matchup needs team1 and team2 with two distinct player ids each.'}), 400
+        seats.append(team1 + team2)
+    ratings = dict(db.session.execute(
+        select(Player.id, Player.rating).where(Player.id.in_({player_id for seat in seats for player_id in seat}))
+    ).all())
+    missing = sorted({player_id for seat in seats for player_id in seat} - set(ratings))
+    if missing:
+        return jsonify({'error': 'Unknown players.', 'players': missing}), 404
+
+    current = np.array([[ratings[player_id] for player_id in seat] for seat in seats])
+    expected, team1_wins = elo_kernel(current, np.ones(len(seats)))
+    _, team2_wins = elo_kernel(current, np.full(len(seats), 2))
+    return jsonify({'results': [
+        {'team1': seat[:2], 'team2': seat[2:], 'team1_win_probability': probability,
+         'ratings': dict(zip(map(str, seat), rating_row)),
+         'if_team1_wins': dict(zip(map(str, seat), team1_row)),
+         'if_team2_wins': dict(zip(map(str, seat), team2_row))}
+        for seat, probability, rating_row, team1_row, team2_row in zip(
+            seats, expected.tolist(), current.tolist(), team1_wins.tolist(), team2_wins.tolist())
+    ]})
+
+# Metrics Route: Prometheus text format, plus the leaderboard cache and
+# ratings version read at scrape time
+@app.route('/metrics')
+def metrics_endpoint():
+    stats = leaderboard_cache.stats()
+    lines = [
+        '# HELP leaderboard_cache_hits_total Leaderboard fragments served from the cache.',
+        '# TYPE leaderboard_cache_hits_total counter',
+        f'leaderboard_cache_hits_total {stats["hits"]}',
+        '# HELP leaderboard_cache_misses_total Leaderboard fragments rendered.',
+        '# TYPE leaderboard_cache_misses_total counter',
+        f'leaderboard_cache_misses_total {stats["misses"]}',
+        '# HELP ratings_version Current ratings version.',
+        '# TYPE ratings_version gauge',
+        f'ratings_version {ratings_version()}',
+    ]
+    return app.response_class(metrics.render() + '\n'.join(lines) + '\n',
+                              mimetype='text/plain; version=0.0.4')
+
+# Player Search Route: typeahead suggestions for the game form
+@app.route('/api/players/search')
+@login_required(api=True)
+def api_player_search():
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    return jsonify({'players': player_search.search(players_version(), request.args.get('q', ''), limit)})
+
+# Matchmaking: splits a pool of present players into 2v2 games whose
+# expected scores are as close to even as possible. Candidate groupings are
+# rating orders with a little noise; each is cut into groups of four, and
+# all three team splits of every group in every candidate are scored at
+# once. The cheapest candidate wins.
+MATCH_SPLITS = ((0, 1, 2, 3), (0, 2, 1, 3), (0, 3, 1, 2))
+
+Match = namedtuple('Match', ['team1', 'team2', 'team1_win_probability'])
+
+# ratings has one entry per player (a multiple of four); partner_counts is
+# an optional (n, n) matrix of recent games played together. Returns the
+# matches as index quadruples plus each one's team 1 expected score.
+def balance_teams(ratings, partner_counts=None, partner_penalty=0.05, candidates=64, noise=50.0, seed=0):
+    ratings = np.asarray(ratings, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    jitter = rng.normal(0, noise, (candidates, len(ratings)))
+    jitter[0] = 0
+    orders = np.argsort(-(ratings + jitter), axis=1)
+    groups = orders.reshape(candidates, -1, 4)
+    seats = groups[..., np.array(MATCH_SPLITS)]
+    seat_ratings = ratings[seats]
+    expected = expected_score(seat_ratings[..., :2].mean(axis=-1), seat_ratings[..., 2:].mean(axis=-1))
+    cost = np.abs(expected - 0.5)
+    if partner_counts is not None:
+        repeats = partner_counts[seats[..., 0], seats[..., 1]] + partner_counts[seats[..., 2], seats[..., 3]]
+        cost = cost + partner_penalty * repeats
+    best_split = cost.argmin(axis=-1)
+    best = int(np.take_along_axis(cost, best_split[..., None], axis=-1).sum(axis=(1, 2)).argmin())
+    groups = np.arange(groups.shape[1])
+    return seats[best, groups, best_split[best]], expected[best, groups, best_split[best]]
+
+def make_matches(player_ids, avoid_recent_partners=True, spread_games=True):
+    rows = db.session.execute(
+        select(Player.id, User.username, Player.rating, Player.games_played)
+        .join(User, User.id == Player.id)
+        .where(Player.id.in_(player_ids), User.is_approved == True)
+        .order_by(Player.id)
+    ).all()
+    position = {row.id: index for index, row in enumerate(rows)}
+    recent_games = np.zeros(len(rows))
+    partner_counts = np.zeros((len(rows), len(rows)))
+    since = datetime.datetime.utcnow() - datetime.timedelta(hours=app.config['MATCHMAKING_RECENT_HOURS'])
+    recent = db.session.execute(
+        select(GameParticipant.game_id, GameParticipant.team, GameParticipant.user_id)
+        .join(Game, Game.id == GameParticipant.game_id)
+        .where(GameParticipant.user_id.in_(list(position)), Game.date_submitted >= since)
+    ).all()
+    teams = {}
+    for game_id, team, user_id in recent:
+        recent_games[position[user_id]] += 1
+        teams.setdefault((game_id, team), []).append(position[user_id])
+    for members in teams.values():
+        if len(members) == 2:
+            partner_counts[members[0], members[1]] += 1
+            partner_counts[members[1], members[0]] += 1
+
+    # Whoever has played most lately sits out when the pool isn't a multiple of four
+    playing = np.arange(len(rows))
+    if spread_games:
+        playing = np.lexsort((np.array([row.games_played for row in rows]), recent_games))
+    sitting_out = playing[len(rows) - len(rows) % 4:]
+    playing = playing[:len(rows) - len(rows) % 4]
+    if not len(playing):
+        return [], [rows[index] for index in sitting_out]
+    seats, expected = balance_teams(
+        [rows[index].rating for index in playing],
+        partner_counts[np.ix_(playing, playing)] if avoid_recent_partners else None,
+    )
+    matches = [
+        Match([rows[playing[index]] for index in seat[:2]], [rows[playing[index]] for index in seat[2:]], float(score))
+        for seat, score in zip(seats.tolist(), expected.tolist())
+    ]
+    return matches, [rows[index] for index in sitting_out]
+
+# Matchmaking Routes
+@app.route('/matchmaking', methods=['GET', 'POST'])
+@login_required(approved=True)
+def matchmaking():
+    matches = sitting_out = None
+    present = set()
+    if request.method == 'POST':
+        present = set(request.form.getlist('present', type=int))
+        if len(present) < 4:
+            flash('Select at least four players.')
+        else:
+            matches, sitting_out = make_matches(
+                present, 'avoid_recent_partners' in request.form, 'spread_games' in request.form)
+    players = db.session.execute(
+        select(Player.id, User.username, Player.rating)
+        .join(User, User.id == Player.id).where(User.is_approved == True).order_by(User.username)
+    ).all()
+    return render_template('matchmaking.html', players=players, present=present,
+                           matches=matches, sitting_out=sitting_out)
+
+@app.route('/api/matchmaking', methods=['POST'])
+@login_required(api=True)
+def api_matchmaking():
+    payload = request.get_json(silent=True) or {}
+    player_ids = payload.get('players') or []
+    if not isinstance(player_ids, list) or not all(isinstance(player_id, int) for player_id in player_ids):
+        return jsonify({'error': 'players must be a list of player ids.'}), 400
+    matches, sitting_out = make_matches(
+        set(player_ids), payload.get('avoid_recent_partners', True), payload.get('spread_games', True))
+    return jsonify({
+        'matches': [
+            {'team1': [player.id for player in match.team1], 'team2': [player.id for player in match.team2],
+             'team1_win_probability': match.team1_win_probability}
+            for match in matches
+        ],
+        'sitting_out': [player.id for player in sitting_out],
+    })
+
+# Admin Dashboard Route
+@app.route('/admin_dashboard')
+@login_required(admin=True)
+def admin_dashboard():
+    user = g.user
+    pending_users = User.query.filter_by(is_approved=False).all()
+    users = User.query.filter_by(is_approved=True).all()
+    page = paginate_games(game_feed_query())
+    return render_template('admin_dashboard.html', user=user, pending_users=pending_users, users=users,
+                           games=page.items, page=page, cache_stats=leaderboard_cache.stats(),
+                           season=current_season())
+
+# Import Games Route
+@app.route('/import_games', methods=['POST'])
+@login_required(admin=True)
+def import_games_upload():
+    admin = g.user
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Please choose a CSV or JSONL file to import.')
+        return redirect(url_for('admin_dashboard'))
+    fmt = 'csv' if upload.filename.lower().endswith('.csv') else 'jsonl'
+    job_name = import_job_name(f'upload:{upload.filename}', upload.stream)
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    try:
+        result = import_games(read_game_records(stream, fmt), job_name, admin.id)
+    except (ValueError, UnicodeDecodeError):
+        db.session.rollback()
+        job = db.session.get(ImportJob, job_name)
+        # A fixed file hashes differently, so it can't resume this job
+        flash(f'Import stopped: the file could not be parsed. The first {job.rows_done if job else 0} rows were '
+              'imported; remove them and the bad row before uploading the rest.')
+        return redirect(url_for('admin_dashboard'))
+    flash(f'Imported {result.imported} games ({result.skipped} skipped) in {result.seconds:.1f}s.')
+    return redirect(url_for('admin_dashboard'))
+
+# Export Route: streams /export/games or /export/history as a download;
+# ?format=jsonl for JSON lines, ?gzip=1 to compress
+@app.route('/export/<kind>')
+@login_required(admin=True)
+def export_data(kind):
+    if kind not in EXPORTS:
+        abort(404)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        abort(400)
+    compress = request.args.get('gzip') == '1'
+    filename = f'{kind}.{fmt}' + ('.gz' if compress else '')
+    mimetype = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    return app.response_class(
+        stream_with_context(export_chunks(kind, fmt, compress)), mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+# Approve User Route
+@app.route('/approve_user/<int:user_id>')
+@login_required(admin=True)
+def approve_user(user_id):
+    user = db.session.get(User, user_id)
+    user.is_approved = True
+    db.session.commit()
+    # Add to player table
+    player = Player(id=user.id)
+    db.session.add(player)
+    db.session.flush()
+    bump_ratings_version([(player.id, player.rating, user.username)])
+    bump_players_version()
+    db.session.commit()
+    user_cache.invalidate(user_id)
+    flash('User approved.')
+    return redirect(url_for('admin_dashboard'))
+
+# Delete User Route
+@app.route('/delete_user/<int:user_id>')
+@login_required(admin=True)
+def delete_user(user_id):
+    if user_id == g.user.id:
+        return redirect(url_for('index'))
+    user = db.session.get(User, user_id)
+    player = db.session.get(Player, user_id)
+    if player:
+        db.session.execute(delete(GlickoState).where(GlickoState.player_id == user_id))
+        db.session.execute(delete(PlayerStats).where(PlayerStats.player_id == user_id))
+        db.session.execute(delete(PairStats).where((PairStats.player_a == user_id) | (PairStats.player_b == user_id)))
+        db.session.delete(player)
+    db.session.delete(user)
+    bump_ratings_version([(user_id, None, None)])
+    bump_players_version()
+    db.session.commit()
+    user_cache.invalidate(user_id)
+    flash('User deleted.')
+    return redirect(url_for('admin_dashboard'))
+
+# Delete Game Route with ELO refund
+@app.route('/delete_game/<int:game_id>')
+@login_required(admin=True)
+def delete_game(game_id):
+    game = db.session.get(Game, game_id)
+    rebuild = game.processed and not rating_engine().incremental
+    removed = (game.id, game.date_submitted, game_seats(game), game.winning_team) if game.processed else None
+    ratings = {}
+    if game.processed and not rebuild:
+        # Refund ELO changes and rerate the later games they fed into
+        ratings = rerate_after_removal(game)
+    db.session.delete(game)
+    db.session.flush()
+    if removed:
+        record_results([removed], sign=-1)
+    bump_ratings_version([(player_id, rating, None) for player_id, rating in ratings.items()])
+    db.session.commit()
+    if rebuild:
+        rebuild_ratings()
+    flash('Game deleted and ELO changes refunded.')
+    return redirect(url_for('admin_dashboard'))
+
+# Close Season Route
+@app.route('/close_season', methods=['POST'])
+@login_required(admin=True)
+def close_season_route():
+    name = request.form.get('name', '').strip()
+    carry_over = request.form.get('carry_over', 100, type=float)
+    if not name or not 0 <= carry_over <= 100:
+        flash('Give the new season a name and a carry-over between 0 and 100%.')
+        return redirect(url_for('admin_dashboard'))
+    finished = current_season().name
+    moved = close_season(name, carry_over / 100)
+    flash(f'{finished} closed with {moved} games archived; {name} has started.')
+    return redirect(url_for('admin_dashboard'))
+
+# Runs one of this app's CLI commands in a child process
+def flask_command(*args):
+    return [sys.executable, '-m', 'flask', '--app', os.path.abspath(__file__), *map(str, args)]
+
+# Benchmarks: rating math in-process, and process_game plus the hot routes
+# at each requested history size. Every size runs in a child process
+# against a throwaway SQLite file so the real database is never touched.
+BENCHMARK_ROUTES = ('/leaderboard', '/my_games', '/dashboard', '/admin_dashboard')
+
+def latency_summary(samples):
+    samples = np.array(samples) * 1000
+    return {
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p90_ms': float(np.percentile(samples, 90)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'max_ms': float(samples.max()),
+        'samples': len(samples),
+    }
+
+def benchmark_rating_math(number=100000):
+    seat_ratings = [1520.0, 1610.0, 1480.0, 2200.0]
+    results = {}
+    for name, statement in (('get_k_factor', lambda: get_k_factor(2150.0)),
+                            ('elo_deltas', lambda: elo_deltas(seat_ratings, 1))):
+        runs = timeit.repeat(statement, number=number, repeat=5)
+        results[name] = {'ns_per_call': min(runs) / number * 1e9}
+    rng = np.random.default_rng(0)
+    ratings = rng.normal(1500, 300, (number, 4))
+    winners = rng.integers(1, 3, number)
+    runs = timeit.repeat(lambda: elo_kernel(ratings, winners), number=1, repeat=5)
+    results['elo_kernel'] = {'ns_per_call': min(runs) / number * 1e9}
+    return results
+
+def benchmark_scale(games, players, repeat, seed):
+    create_tables(demo=False)
+    started = time.perf_counter()
+    generate_league(players, games, seed)
+    result = {'games': games, 'players': players, 'generate_s': time.perf_counter() - started, 'routes': {}}
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+    admin = User.query.filter_by(is_admin=True).first()
+    busiest = Player.query.order_by(Player.games_played.desc()).first()
+    client = app.test_client()
+    for path in BENCHMARK_ROUTES:
+        with client.session_transaction() as browser_session:
+            browser_session['user_id'] = busiest.id if path == '/my_games' else admin.id
+        samples = []
+        queries = []
+        for _ in range(repeat):
+            del statements[:]
+            started = time.perf_counter()
+            response = client.get(path)
+            samples.append(time.perf_counter() - started)
+            queries.append(len(statements))
+            assert response.status_code == 200, (path, response.status_code)
+        result['routes'][path] = dict(latency_summary(samples), queries=int(np.median(queries)))
+
+    # process_game end to end on freshly submitted games
+    rng = np.random.default_rng(seed)
+    player_ids = [player_id for (player_id,) in db.session.execute(select(Player.id))]
+    pending = []
+    for _ in range(repeat):
+        seats = rng.choice(player_ids, 4, replace=False).tolist()
+        game = Game(team1_player1_id=seats[0], team1_player2_id=seats[1], team2_player1_id=seats[2],
+                    team2_player2_id=seats[3], winning_team=int(rng.integers(1, 3)), submitted_by=admin.id,
+                    confirmations=4, status='confirmed', processed=False)
+        set_participants(game)
+        db.session.add(game)
+        pending.append(game)
+    db.session.commit()
+    samples = []
+    queries = []
+    for game_id in [game.id for game in pending]:
+        del statements[:]
+        started = time.perf_counter()
+        process_game(game_id)
+        samples.append(time.perf_counter() - started)
+        queries.append(len(statements))
+    result['process_game'] = dict(latency_summary(samples), queries=int(np.median(queries)))
+    return result
+
+# p90 swings too much to compare below this many samples per route
+BENCHMARK_MIN_TAIL_SAMPLES = 200
+
+# Flattens a result file into {metric name: value} for baseline comparison
+def benchmark_metrics(results):
+    metrics = {}
+    for name, values in results['rating_math'].items():
+        metrics[f'{name}.ns_per_call'] = values['ns_per_call']
+    for games, scale in results['scales'].items():
+        for path, values in list(scale['routes'].items()) + [('process_game', scale['process_game'])]:
+            keys = ['p50_ms', 'queries']
+            if values.get('samples', 0) >= BENCHMARK_MIN_TAIL_SAMPLES:
+                keys.append('p90_ms')
+            for key in keys:
+                metrics[f'{games}:{path}.{key}'] = values[key]
+    return metrics
+
+def compare_benchmarks(results, baseline, tolerance, min_delta_ms=1.0, min_delta_ns=50.0):
+    current = benchmark_metrics(results)
+    regressions = []
+    for name, base in benchmark_metrics(baseline).items():
+        if name not in current:
+            continue
+        # Query counts must not grow at all. Timings get the tolerance and
+        # an absolute floor on top, since a sub-millisecond route or a
+        # 150ns call can move by half from scheduler noise alone.
+        if name.endswith('.queries'):
+            limit = base
+        else:
+            floor = min_delta_ms if name.endswith('_ms') else min_delta_ns
+            limit = max(base * (1 + tolerance), base + floor)
+        if current[name] > limit:
+            regressions.append((name, base, current[name]))
+    return regressions
+
+@app.cli.command('benchmark')
+@click.option('--games', 'scales', type=int, multiple=True, default=(1000, 100000, 1000000), show_default=True,
+              help='History size to benchmark; repeat for several sizes.')
+@click.option('--players', type=int, help='Players per size; defaults to games / 40 (at least 20).')
+@click.option('--repeat', default=50, show_default=True, help='Requests per route and process_game calls.')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--output', default='benchmark.json', show_default=True)
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Fail on regressions against this file.')
+@click.option('--tolerance', default=0.25, show_default=True, help='Allowed relative slowdown for timings.')
+@click.option('--min-delta-ms', default=1.0, show_default=True,
+              help='Route and process_game slowdowns smaller than this are never regressions.')
+def benchmark_command(scales, players, repeat, seed, output, baseline, tolerance, min_delta_ms):
+    results = {
+        'created': datetime.datetime.utcnow().isoformat(),
+        'python': sys.version.split()[0],
+        'rating_math': benchmark_rating_math(),
+        'scales': {},
+    }
+    for games in scales:
+        scale_players = players or max(20, games // 40)
+        print(f'Benchmarking {games} games, {scale_players} players...')
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(directory, 'benchmark.db'))
+            child = subprocess.run(
+                flask_command('benchmark-scale', games, scale_players, repeat, seed),
+                env=env, capture_output=True, text=True, check=True,
+            )
+        results['scales'][str(games)] = json.loads(child.stdout.strip().splitlines()[-1])
+        for path, values in list(results['scales'][str(games)]['routes'].items()):
+            print(f"  {path}: p50 {values['p50_ms']:.1f}ms, p99 {values['p99_ms']:.1f}ms, {values['queries']} queries")
+    with open(output, 'w') as handle:
+        json.dump(results, handle, indent=2)
+    print(f'Results written to {output}.')
+    if baseline:
+        with open(baseline) as handle:
+            regressions = compare_benchmarks(results, json.load(handle), tolerance, min_delta_ms)
+        for name, base, value in regressions:
+            print(f'REGRESSION {name}: {base:.3f} -> {value:.3f}', file=sys.stderr)
+        if regressions:
+            raise click.ClickException(f'{len(regressions)} benchmark regressions against {baseline}.')
+        print(f'No regressions against {baseline}.')
+
+@app.cli.command('benchmark-scale', hidden=True)
+@click.argument('games', type=int)
+@click.argument('players', type=int)
+@click.argument('repeat', type=int)
+@click.argument('seed', type=int)
+def benchmark_scale_command(games, players, repeat, seed):
+    print(json.dumps(benchmark_scale(games, players, repeat, seed)))
+
+# Concurrency stress test: for each storage profile, several processes of
+# several threads each submit games through dashboard and confirm them
+# through confirm_game against a shared throwaway database. Lock wait is the
+# time spent inside write statements, which includes any busy waiting.
+def stress_worker(index, threads, seconds, seed):
+    usernames = dict(db.session.execute(
+        select(Player.id, User.username).join(User, User.id == Player.id).order_by(Player.id)).all())
+    players = list(usernames)
+    db.session.remove()
+    lock_wait = [0.0]
+    lock = threading.Lock()
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info['stress_started'] = time.perf_counter()
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(' ', 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            with lock:
+                lock_wait[0] += time.perf_counter() - conn.info.pop('stress_started')
+
+    event.listen(db.engine, 'before_cursor_execute', before_execute)
+    event.listen(db.engine, 'after_cursor_execute', after_execute)
+    app.logger.disabled = True
+    results = {'requests': 0, 'errors': 0, 'games': 0, 'latencies': []}
+    deadline = time.perf_counter() + seconds
+
+    def hammer(thread_index):
+        rng = random.Random(seed * 1000 + index * threads + thread_index)
+        # Each thread submits as its own player so it can find its games
+        submitter = players[(index * threads + thread_index) % len(players)]
+        others = [player_id for player_id in players if player_id != submitter]
+        client = app.test_client()
+        latencies = []
+        requests = errors = games = 0
+
+        def call(user_id, path, data=None):
+            nonlocal requests, errors
+            with client.session_transaction() as browser_session:
+                browser_session['user_id'] = user_id
+            started = time.perf_counter()
+            try:
+                response = client.post(path, data=data) if data else client.get(path)
+                failed = response.status_code >= 500
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            requests += 1
+            errors += failed
+            return not failed
+
+        last_game_id = 0
+        while time.perf_counter() < deadline:
+            seats = [submitter] + rng.sample(others, 3)
+            form = {f'player{slot}': usernames[player_id] for slot, player_id in enumerate(seats, start=1)}
+            form['winning_team'] = str(rng.randint(1, 2))
+            if not call(submitter, '/dashboard', form):
+                continue
+            # A rejected form redirects like a good one, so the game has to
+            # be found: the newest one by this submitter with these seats
+            with app.app_context():
+                game_id = db.session.execute(
+                    select(func.max(Game.id)).where(
+                        Game.submitted_by == submitter, Game.id > last_game_id,
+                        *[column == player_id for (_, _, column), player_id in zip(PARTICIPANT_COLUMNS, seats)])
+                ).scalar()
+            if game_id is None:
+                errors += 1
+                continue
+            last_game_id = game_id
+            if not all(call(confirmer, f'/confirm_game/{game_id}') for confirmer in seats[1:3]):
+                continue
+            # Only a game the database shows as confirmed counts
+            with app.app_context():
+                confirmed = db.session.execute(
+                    select(Game.status == 'confirmed').where(Game.id == game_id)).scalar()
+            if confirmed:
+                games += 1
+            else:
+                errors += 1
+        with lock:
+            results['requests'] += requests
+            results['errors'] += errors
+            results['games'] += games
+            results['latencies'].extend(latencies)
+
+    workers = [threading.Thread(target=hammer, args=(thread_index,)) for thread_index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results['lock_wait_s'] = lock_wait[0]
+    return results
+
+@app.cli.command('stress')
+@click.option('--profile', 'profiles', multiple=True, default=tuple(DATABASE_PROFILES), show_default=True,
+              type=click.Choice(list(DATABASE_PROFILES)))
+@click.option('--processes', default=4, show_default=True)
+@click.option('--threads', default=4, show_default=True, help='Threads per process.')
+@click.option('--seconds', default=10, show_default=True)
+@click.option('--players', default=40, show_default=True)
+@click.option('--seed', default=1, show_default=True)
+def stress_command(profiles, processes, threads, seconds, players, seed):
+    for profile in profiles:
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, DATABASE_PROFILE=profile,
+                       DATABASE_URL='sqlite:///' + os.path.join(directory, 'stress.db'))
+            subprocess.run(flask_command('generate-data', '--players', max(players, 4), '--games', 0, '--seed', seed),
+                           env=env, capture_output=True, check=True)
+            children = [
+                subprocess.Popen(flask_command('stress-worker', index, threads, seconds, seed),
+                                 env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                for index in range(processes)
+            ]
+            outputs = [json.loads(child.communicate()[0].strip().splitlines()[-1]) for child in children]
+        requests = sum(output['requests'] for output in outputs)
+        errors = sum(output['errors'] for output in outputs)
+        games = sum(output['games'] for output in outputs)
+        lock_wait = sum(output['lock_wait_s'] for output in outputs)
+        latency = latency_summary([value for output in outputs for value in output['latencies']] or [0])
+        print(f'{profile}: {requests / seconds:.0f} requests/s, {games / seconds:.1f} confirmed games/s, '
+              f'{errors} errors, lock wait {lock_wait:.2f}s ({lock_wait / max(requests, 1) * 1000:.1f}ms/request), '
+              f"p50 {latency['p50_ms']:.1f}ms, p99 {latency['p99_ms']:.1f}ms")
+
+@app.cli.command('stress-worker', hidden=True)
+@click.argument('index', type=int)
+@click.argument('threads', type=int)
+@click.argument('seconds', type=float)
+@click.argument('seed', type=int)
+def stress_worker_command(index, threads, seconds, seed):
+    print(json.dumps(stress_worker(index, threads, seconds, seed)))
+
+# Templates as multi-line strings with improved styling
+base_template = '''
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8" />
+    <title>BaraziliyaRank</title>
+    <!-- Bootstrap CSS -->
+    <link
+        rel="stylesheet"
+        href="https://stackpath.bootstrapcdn.com/bootswatch/4.5.2/cosmo/bootstrap.min.css"
+    />
+    <style>
+        body {
+            background-image: url('https://i.imgur.com/8Zf4gCc.jpg');
+            background-size: cover;
+            background-attachment: fixed;
+        }
+        .navbar-brand {
+            font-weight: bold;
+        }
+        .card {
+            background-color: rgba(255, 255, 255, 0.9);
+        }
+        .content-wrapper {
+            background-color: rgba(255, 255, 255, 0.9);
+            padding: 20px;
+            border-radius: 10px;
+        }
+    </style>
+</head>
+<body>
+    <!-- Header -->
+    <nav class="navbar navbar-expand-lg navbar-dark bg-primary">
+      <a class="navbar-brand" href="{{ url_for('index') }}">
+        &#9824; BaraziliyaRank
+      </a>
+    </nav>
+    {% with messages = get_flashed_messages() %}
+    {% if messages %}
+    <div class="container mt-3">
+        {% for message in messages %}
+        <div class="alert alert-info">{{ message }}</div>
+        {% endfor %}
+    </div>
+    {% endif %}
+    {% endwith %}
+    <div class="container mt-5 content-wrapper">
+        {% block content %}{% endblock %}
+    </div>
+    <!-- Bootstrap JS -->
+    <script src="https://code.jquery.com/jquery-3.5.1.slim.min.js"></script>
+    <script
+        src="https://cdn.jsdelivr.net/npm/bootstrap@4.5.2/dist/js/bootstrap.bundle.min.js"
+    ></script>
+</body>
+</html>
+'''
+
+pagination_template = '''
+{% macro pager(page, prev_args={}, next_args={}) %}
+{% if page.prev_cursor or page.next_cursor %}
+<nav>
+    <ul class="pagination justify-content-center">
+        <li class="page-item {% if not page.prev_cursor %}disabled{% endif %}">
+            {% if page.prev_cursor %}
+            <a class="page-link" href="{{ url_for(request.endpoint, before=page.prev_cursor, **prev_args) }}">&laquo; Previous</a>
+            {% else %}
+            <span class="page-link">&laquo; Previous</span>
+            {% endif %}
+        </li>
+        <li class="page-item {% if not page.next_cursor %}disabled{% endif %}">
+            {% if page.next_cursor %}
+            <a class="page-link" href="{{ url_for(request.endpoint, after=page.next_cursor, **next_args) }}">Next &raquo;</a>
+            {% else %}
+            <span class="page-link">Next &raquo;</span>
+            {% endif %}
+        </li>
+    </ul>
+</nav>
+{% endif %}
+{% endmacro %}
+'''
+
+login_template = '''
+{% extends 'base.html' %}
+{% block content %}
+<h2 class="text-center">Login</h2>
+<form method="post">
+    <div class="form-group">
+        <label for="username">Username</label>
+        <input
+            type="text"
+            class="form-control"
+            id="username"
+            name="username"
+            required
+        />
+    </div>
+    <div class="form-group">
+        <label for="password">Password</label>
+        <input
+            type="password"
+            class="form-control"
+            id="password"
+            name="password"
+            required
+        />
+    </div>
+    <button type="submit" class="btn btn-primary btn-block">Login</button>
+    <a href="{{ url_for('signup') }}" class="btn btn-link btn-block">Sign Up</a>
+</form>
+{% endblock %}
+'''
+
+signup_template = '''
+{% extends 'base.html' %}
+{% block content %}
+<h2 class="text-center">Sign Up</h2>
+<form method="post">
+    <div class="form-group">
+        <label for="username">Username</label>
+        <input
+            type="text"
+            class="form-control"
+            id="username"
+            name="username"
+            required
+        />
+    </div>
+    <div class="form-group">
+        <label for="password">Password</label>
+        <input
+            type="password"
+            class="form-control"
+            id="password"
+            name="password"
+            required
+        />
+    </div>
+    <button type="submit" class="btn btn-primary btn-block">Sign Up</button>
+    <a href="{{ url_for('login') }}" class="btn btn-link btn-block">Login</a>
+</form>
+{% endblock %}
+'''
+
+index_template = '''
+{% extends 'base.html' %}
+{% block content %}
+<h2 class="text-center">Welcome, {{ user.username }}</h2>
+{% if not user.is_approved %}
+<p class="text-center text-danger">
+    Your account is pending admin approval.
+</p>
+{% else %}
+<div class="text-center">
+    <a href="{{ url_for('dashboard') }}" class="btn btn-success btn-lg">Submit Game</a>
+    <a href="{{ url_for('leaderboard') }}" class="btn btn-info btn-lg">Leaderboard</a>
+    <a href="{{ url_for('my_games') }}" class="btn btn-warning btn-lg">My Games</a>
+    <a href="{{ url_for('matchmaking') }}" class="btn btn-primary btn-lg">Matchmaking</a>
+    <a href="{{ url_for('seasons') }}" class="btn btn-dark btn-lg">Seasons</a>
+    {% if user.is_admin %}
+    <a href="{{ url_for('admin_dashboard') }}" class="btn btn-danger btn-lg">Admin Dashboard</a>
+    {% endif %}
+    <a href="{{ url_for('logout') }}" class="btn btn-secondary btn-lg">Logout</a>
+</div>
+{% if rank %}
+<h4 class="text-center mt-4">You are ranked #{{ rank }} of {{ ranked }}</h4>
+<table class="table table-sm mx-auto" style="max-width: 30rem;">
+    <tbody>
+        {% for entry in neighbours %}
+        <tr {% if entry.id == user.id %}class="table-primary"{% endif %}>
+            <th scope="row">{{ entry.rank }}</th>
+            <td><a href="{{ url_for('player_profile', player_id=entry.id) }}">{{ entry.username }}</a></td>
+            <td>{{ entry.rating|round(0) }}</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+{% endif %}
+{% endif %}
+{% endblock %}
+'''
+
+dashboard_template = '''
+{% extends 'base.html' %}
+{% block content %}
+<h2 class="text-center">Submit a Game</h2>
+<form method="post">
+    <div class="form-row">
+        {% for number in range(1, 5) %}
+        <div class="form-group col-md-3">
+            <label for="player{{ number }}">Player {{ number }}</label>
+            <input
+                type="text"
+                class="form-control player-search"
+                id="player{{ number }}"
+                name="player{{ number }}"
+                list="player{{ number }}-options"
+                autocomplete="off"
+                placeholder="Start typing a username"
+                required
+            />
+            <datalist id="player{{ number }}-options"></datalist>
+        </div>
+        {% endfor %}
+    </div>
+    <div class="form-group">
+        <label>Winning Team</label>
+        <div>
+            <div class="form-check form-check-inline">
+                <input
+                    class="form-check-input"
+                    type="radio"
+                    name="winning_team"
+                    id="team1"
+                    value="1"
+                    required
+                />
+                <label class="form-check-label" for="team1">Team 1 (Player 1 & 2)</label>
+            </div>
+            <div class="form-check form-check-inline">
+                <input
+                    class="form-check-input"
+                    type="radio"
+                    name="winning_team"
+                    id="team2"
+                    value="2"
+                    required
+                />
+                <label class="form-check-label" for="team2">Team 2 (Player 3 & 4)</label>
+            </div>
+        </div>
+    </div>
+    <button type="submit" class="btn btn-primary btn-block">Submit Game</button>
+</form>
+<script>
+document.querySelectorAll('input.player-search').forEach(function (input) {
+    var options = document.getElementById(input.getAttribute('list'));
+    var timer = null;
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            fetch('{{ url_for('api_player_search') }}?q=' + encodeURIComponent(input.value))
+                .then(function (response) { return response.json(); })
+                .then(function (result) {
+                    options.innerHTML = '';
+                    result.players.forEach(function (player) {
+                        var option = document.createElement('option');
+                        option.value = player.username;
+                        options.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+});
+</script>
+<div class="text-center mt-4">
+    <a href="{{ url_for('index') }}" class="btn btn-secondary">Back to Home</a>
+    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
+</div>
+{% endblock %}
+'''
+
+leaderboard_template = '''
+{% extends 'base.html' %}
+{% block content %}
+<h2 class="text-center">Leaderboard</h2>
+{{ table }}
+<div class="text-center">
+    <a href="{{ url_for('index') }}" class="btn btn-secondary">Back to Home</a>
+    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
+</div>
+{% endblock %}
+'''
+
+leaderboard_table_template = '''
+{% from 'pagination.html' import pager with context %}
+<table class="table table-striped table-hover">
+    <thead class="thead-dark">
+        <tr>
+            <th scope="col">Rank</th>
+            <th scope="col">Name</th>
+            <th scope="col">ELO Rating</th>
+            <th scope="col">Games Played</th>
+            <th scope="col">Trend</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for player in players %}
+        <tr>
+            <th scope="row">{{ player.rank }}</th>
+            <td><a href="{{ url_for('player_profile', player_id=player.id) }}">{{ player.username }}</a></td>
+            <td>{{ player.rating|round(0) }}</td>
+            <td>{{ player.games_played }}</td>
+            <td>
+                {% if sparklines.get(player.id) %}
+                <svg class="sparkline" width="100" height="20" viewBox="0 0 100 20">
+                    <polyline fill="none" stroke="#2780e3" stroke-width="1.5" points="{{ sparklines[player.id] }}"/>
+                </svg>
+                {% endif %}
+            </td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+{{ pager(page) }}
+'''
+
+my_games_template = '''
+{% extends 'base.html' %}
+{% from 'pagination.html' import pager with context %}
+{% block content %}
+<h2 class="text-center">My Games</h2>
+{% for game in games %}
+<div class="card mb-3">
+    <div class="card-body">
+        <h5 class="card-title">
+            Game ID: {{ game.id }} - {{ game.status|capitalize }} Game - {{ game.date_submitted.strftime('%Y-%m-%d %H:%M') }}
+            {% if game.status == 'confirmed' and not game.processed %}
+            <span class="badge badge-warning">Processing</span>
+            {% endif %}
+        </h5>
+        <p class="card-text">
+            <strong>Team 1:</strong>
+            {{ game.team1_player1.username }}, {{ game.team1_player2.username }}
+        </p>
+        <p class="card-text">
+            <strong>Team 2:</strong>
+            {{ game.team2_player1.username }}, {{ game.team2_player2.username }}
+        </p>
+        <p class="card-text">
+            <strong>Winning Team:</strong> Team {{ game.winning_team }}
+        </p>
+        <p class="card-text">
+            <strong>Confirmations:</strong> {{ game.confirmations }}/4
+        </p>
+        {% if game.processed %}
+        <p class="card-text">
+            <strong>ELO Changes:</strong>
+            <ul>
+                {% for change in game.elo_changes %}
+                <li>{{ change.player.user.username }}: {{ change.elo_change|round(2) }}</li>
+                {% endfor %}
+            </ul>
+        </p>
+        {% endif %}
+        {% if game.status == 'draft' and user.id != game.submitted_by %}
+        <a href="{{ url_for('confirm_game', game_id=game.id) }}" class="btn btn-success">Confirm Game</a>
+        {% endif %}
+    </div>
+</div>
+{% endfor %}
+{{ pager(page) }}
+<div class="text-center">
+    <a href="{{ url_for('index') }}" class="btn btn-secondary">Back to Home</a>
+    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
+</div>
+{% endblock %}
+'''
+
+admin_dashboard_template = '''
+{% extends 'base.html' %}
+{% from 'pagination.html' import pager with context %}
+{% block content %}
+<h2 class="text-center">Admin Dashboard</h2>
+<h3>Pending Users</h3>
+{% if pending_users %}
+<table class="table">
+    <thead>
+        <tr>
+            <th>Username</th>
+            <th>Actions</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for pending_user in pending_users %}
+        <tr>
+            <td>{{ pending_user.username }}</td>
+            <td>
+                <a href="{{ url_for('approve_user', user_id=pending_user.id) }}" class="btn btn-success">Approve</a>
+                <a href="{{ url_for('delete_user', user_id=pending_user.id) }}" class="btn btn-danger">Delete</a>
+            </td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+{% else %}
+<p>No pending users.</p>
+{% endif %}
+<h3>All Users</h3>
+<table class="table">
+    <thead>
+        <tr>
+            <th>Username</th>
+            <th>Actions</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for u in users %}
+        <tr>
+            <td>{{ u.username }}</td>
+            <td>
+                {% if u.id != user.id %}
+                <a href="{{ url_for('delete_user', user_id=u.id) }}" class="btn btn-danger">Delete</a>
+                {% endif %}
+            </td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+<p class="text-muted">
+    Leaderboard cache: {{ cache_stats.hits }} hits, {{ cache_stats.misses }} misses (ratings version {{ cache_stats.version }})
+</p>
+<h3>Import Games</h3>
+<form method="post" action="{{ url_for('import_games_upload') }}" enctype="multipart/form-data" class="form-inline mb-4">
+    <input type="file" class="form-control-file mr-2" name="file" accept=".csv,.jsonl,.json" required />
+    <button type="submit" class="btn btn-primary">Import</button>
+</form>
+<h3>Export</h3>
+<p>
+    Games:
+    <a href="{{ url_for('export_data', kind='games') }}">CSV</a> &middot;
+    <a href="{{ url_for('export_data', kind='games', format='jsonl') }}">JSONL</a> &middot;
+    <a href="{{ url_for('export_data', kind='games', gzip=1) }}">CSV (gzip)</a>
+    <br />
+    Rating history:
+    <a href="{{ url_for('export_data', kind='history') }}">CSV</a> &middot;
+    <a href="{{ url_for('export_data', kind='history', format='jsonl') }}">JSONL</a> &middot;
+    <a href="{{ url_for('export_data', kind='history', gzip=1) }}">CSV (gzip)</a>
+</p>
+<h3>Season</h3>
+<p>
+    {{ season.name }} started {{ season.started_at.strftime('%Y-%m-%d') }}.
+    Closing it archives its rated games and starts a new season.
+</p>
+<form method="post" action="{{ url_for('close_season_route') }}" class="form-inline mb-4"
+      onsubmit="return confirm('Close {{ season.name }} and archive its games?');">
+    <input type="text" class="form-control mr-2" name="name" placeholder="New season name" required />
+    <label class="mr-2" for="carry_over">Rating carry-over %</label>
+    <input type="number" class="form-control mr-2" id="carry_over" name="carry_over" min="0" max="100" value="100" />
+    <button type="submit" class="btn btn-warning">Close Season</button>
+</form>
+<h3>All Games</h3>
+{% for game in games %}
+<div class="card mb-3">
+    <div class="card-body">
+        <h5 class="card-title">
+            Game ID: {{ game.id }} - {{ game.status|capitalize }} Game - {{ game.date_submitted.strftime('%Y-%m-%d %H:%M') }}
+            {% if game.status == 'confirmed' and not game.processed %}
+            <span class="badge badge-warning">Processing</span>
+            {% endif %}
+        </h5>
+        <p class="card-text">
+            <strong>Team 1:</strong>
+            {{ game.team1_player1.username }}, {{ game.team1_player2.username }}
+        </p>
+        <p class="card-text">
+            <strong>Team 2:</strong>
+            {{ game.team2_player1.username }}, {{ game.team2_player2.username }}
+        </p>
+        <p class="card-text">
+            <strong>Winning Team:</strong> Team {{ game.winning_team }}
+        </p>
+        <p class="card-text">
+            <strong>Confirmations:</strong> {{ game.confirmations }}/4
+        </p>
+        {% if game.processed %}
+        <p class="card-text">
+            <strong>ELO Changes:</strong>
+            <ul>
+                {% for change in game.elo_changes %}
+                <li>{{ change.player.user.username }}: {{ change.elo_change|round(2) }}</li>
+                {% endfor %}
+            </ul>
+        </p>
+        {% endif %}
+        <a href="{{ url_for('delete_game', game_id=game.id) }}" class="btn btn-danger">Delete Game</a>
+    </div>
+</div>
+{% endfor %}
+{{ pager(page) }}
+<!-- Navigation Links -->
+<div class="text-center mt-4">
+    <a href="{{ url_for('index') }}" class="btn btn-primary">Home</a>
+    <a href="{{ url_for('leaderboard') }}" class="btn btn-info">Leaderboard</a>
+    <a href="{{ url_for('dashboard') }}" class="btn btn-success">Submit Game</a>
+    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
+</div>
+{% endblock %}
+'''
+
+matchmaking_template = '''
+{% extends 'base.html' %}
+{% block content %}
+<h2 class="text-center">Matchmaking</h2>
+{% if matches %}
+<h3>Suggested Games</h3>
+<table class="table">
+    <thead>
+        <tr>
+            <th>Team 1</th>
+            <th>Team 2</th>
+            <th>Team 1 Win Chance</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for match in matches %}
+        <tr>
+            <td>{{ match.team1[0].username }}, {{ match.team1[1].username }}</td>
+            <td>{{ match.team2[0].username }}, {{ match.team2[1].username }}</td>
+            <td>{{ (match.team1_win_probability * 100)|round(1) }}%</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+{% if sitting_out %}
+<p><strong>Sitting out:</strong> {{ sitting_out|map(attribute='username')|join(', ') }}</p>
+{% endif %}
+{% endif %}
+<form method="post">
+    <h3>Who's Here?</h3>
+    <div class="form-row">
+        {% for player in players %}
+        <div class="form-check col-md-3">
+            <input class="form-check-input" type="checkbox" name="present" id="present{{ player.id }}"
+                   value="{{ player.id }}" {% if player.id in present %}checked{% endif %} />
+            <label class="form-check-label" for="present{{ player.id }}">
+                {{ player.username }} ({{ player.rating|round(0) }})
+            </label>
+        </div>
+        {% endfor %}
+    </div>
+    <div class="form-group mt-3">
+        <div class="form-check form-check-inline">
+            <input class="form-check-input" type="checkbox" name="avoid_recent_partners" id="avoid_recent_partners" checked />
+            <label class="form-check-label" for="avoid_recent_partners">Avoid recent partners</label>
+        </div>
+        <div class="form-check form-check-inline">
+            <input class="form-check-input" type="checkbox" name="spread_games" id="spread_games" checked />
+            <label class="form-check-label" for="spread_games">Spread games evenly</label>
+        </div>
+    </div>
+    <button type="submit" class="btn btn-primary btn-block">Make Teams</button>
+</form>
+<div class="text-center mt-4">
+    <a href="{{ url_for('index') }}" class="btn btn-secondary">Back to Home</a>
+    <a href="{{ url_for('logout') }}" class="btn btn-danger">Logout</a>
+</div>
+{% endblock %}
+'''
+
+player_profile_template = '''
+{% extends 'base.html' %}
+{% block content %}
+<h2 class="text-center">{{ username }}</h2>
+{% set games = stats.wins + stats.losses %}
+<div class="row text-center mb-4">
+    <div class="col"><h4>{{ '#%d' % rank if rank else '-' }}</h4>Rank</div>
+    <div class="col"><h4>{{ player.rating|round(0) }}</h4>Rating</div>
+    <div class="col"><h4>{{ stats.wins }} - {{ stats.losses }}</h4>Wins - Losses</div>
+    <div class="col"><h4>{{ ((stats.wins / games * 100) if games else 0)|round(1) }}%</h4>Win Rate</div>
+    <div class="col">
+        <h4>{% if stats.streak > 0 %}W{{ stats.streak }}{% elif stats.streak < 0 %}L{{ -stats.streak }}{% else %}-{% endif %}</h4>
+        Current Streak
+    </div>
+    <div class="col"><h4>{{ stats.longest_win_streak }}</h4>Longest Win Streak</div>
+</div>
+<div class="row mb-4">
+    <div class="col">
+        <strong>Best partner:</strong>
+        {% if best_partner %}
+        {{ best_partner.username }} ({{ best_partner.PairStats.partner_wins }} - {{ best_partner.PairStats.partner_losses }})
+        {% else %}
+        Not enough games yet
+        {% endif %}
+    </div>
+    <div class="col">
+        <strong>Nemesis:</strong>
+        {% if nemesis %}
+        {{ nemesis.username }} ({{ nemesis.PairStats.opponent_wins }} - {{ nemesis.PairStats.opponent_losses }})
+        {% else %}
+        Not enough games yet
+        {% endif %}
+    </div>
+</div>
+<div class="row">
+    <div class="col-md-6">
+        <h3>Partners</h3>
+        <table class="table table-sm">
+            <thead>
+                <tr><th>Player</th><th>Wins</th><th>Losses</th></tr>
+            </thead>
+            <tbody>
+                {% for pair, name in partners %}
+                <tr>
+                    <td><a href="{{ url_for('player_profile', player_id=pair.player_b) }}">{{ name }}</a></td>
+                    <td>{{ pair.partner_wins }}</td>
+                    <td>{{ pair.partner_losses }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+    <div class="col-md-6">
+        <h3>Opponents</h3>
+        <table class="table table-sm">
+            <thead>
+                <tr><th>Player</th><th>Wins</th><th>Losses</th></tr>
+            </thead>
+            <tbody>
+                {% for pair, name in opponents %}
+                <tr>
+                    <td><a href="{{ url_for('player_profile', player_id=pair.player_b) }}">{{ name }}</a></td>
+                    <td>{{ pair.opponent_wins }}</td>
+                    <td>{{ pair.opponent_losses }}</td>
+                </tr>
+                {% endfor %}
+            </tbody>
+        </table>
+    </div>
+</div>
+{% if seasons %}
+<h3>Past Seasons</h3>
+<table class="table table-sm">
+    <thead>
+        <tr><th>Season</th><th>Rank</th><th>Rating</th><th>Wins</th><th>Losses</th></tr>
+    </thead>
+    <tbody>
+        {% for season in seasons %}
+        <tr>
+            <td><a href="{{ url_for('season_standings', season_id=season.id) }}">{{ season.name }}</a></td>
+            <td>{{ season.rank }}</td>
+            <td>{{ season.rating|round(0) }}</td>
+            <td>{{ season.wins }}</td>
+            <td>{{ season.losses }}</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+{% endif %}
+<div class="text-center mt-4">
+    <a href="{{ url_for('leaderboard') }}" class="btn btn-secondary">Back to Leaderboard</a>
+</div>
+{% endblock %}
+'''
+
+seasons_template = '''
+{% extends 'base.html' %}
+{% block content %}
+<h2 class="text-center">Seasons</h2>
+<table class="table table-striped">
+    <thead class="thead-dark">
+        <tr>
+            <th scope="col">Season</th>
+            <th scope="col">Started</th>
+            <th scope="col">Closed</th>
+            <th scope="col">Carry-over</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for season in seasons %}
+        <tr>
+            <td>
+                {% if season.closed_at %}
+                <a href="{{ url_for('season_standings', season_id=season.id) }}">{{ season.name }}</a>
+                {% else %}
+                <a href="{{ url_for('leaderboard') }}">{{ season.name }}</a> <span class="badge badge-success">Current</span>
+                {% endif %}
+            </td>
+            <td>{{ season.started_at.strftime('%Y-%m-%d') }}</td>
+            <td>{{ season.closed_at.strftime('%Y-%m-%d') if season.closed_at else '-' }}</td>
+            <td>{{ (season.carry_over * 100)|round(0)|int }}%</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+<div class="text-center">
+    <a href="{{ url_for('index') }}" class="btn btn-secondary">Back to Home</a>
+</div>
+{% endblock %}
+'''
+
+season_standings_template = '''
+{% extends 'base.html' %}
+{% from 'pagination.html' import pager with context %}
+{% block content %}
+<h2 class="text-center">{{ season.name }}</h2>
+<p class="text-center text-muted">
+    {{ season.started_at.strftime('%Y-%m-%d') }} to {{ season.closed_at.strftime('%Y-%m-%d') }} &middot;
+    <a href="{{ url_for('season_games', season_id=season.id) }}">Games</a>
+</p>
+<table class="table table-striped table-hover">
+    <thead class="thead-dark">
+        <tr>
+            <th scope="col">Rank</th>
+            <th scope="col">Name</th>
+            <th scope="col">Final Rating</th>
+            <th scope="col">Games Played</th>
+            <th scope="col">Wins - Losses</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for standing in standings %}
+        <tr>
+            <th scope="row">{{ standing.rank }}</th>
+            <td>{{ standing.username }}</td>
+            <td>{{ standing.rating|round(0) }}</td>
+            <td>{{ standing.games_played }}</td>
+            <td>{{ standing.wins }} - {{ standing.losses }}</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+{{ pager(page, {'season_id': season.id}, {'season_id': season.id}) }}
+<div class="text-center">
+    <a href="{{ url_for('seasons') }}" class="btn btn-secondary">All Seasons</a>
+</div>
+{% endblock %}
+'''
+
+season_games_template = '''
+{% extends 'base.html' %}
+{% from 'pagination.html' import pager with context %}
+{% block content %}
+<h2 class="text-center">{{ season.name }} Games</h2>
+{% for game in games %}
+<div class="card mb-3">
+    <div class="card-body">
+        <h5 class="card-title">Game ID: {{ game.id }} - {{ game.date_submitted.strftime('%Y-%m-%d %H:%M') }}</h5>
+        <p class="card-text">
+            <strong>Team 1:</strong>
+            {{ names.get(game.team1_player1_id, 'deleted player') }}, {{ names.get(game.team1_player2_id, 'deleted player') }}
+        </p>
+        <p class="card-text">
+            <strong>Team 2:</strong>
+            {{ names.get(game.team2_player1_id, 'deleted player') }}, {{ names.get(game.team2_player2_id, 'deleted player') }}
+        </p>
+        <p class="card-text">
+            <strong>Winning Team:</strong> Team {{ game.winning_team }}
+        </p>
+        <p class="card-text">
+            <strong>ELO Changes:</strong>
+            <ul>
+                {% for player_id, elo_change in changes.get(game.id, []) %}
+                <li>{{ names.get(player_id, 'deleted player') }}: {{ elo_change|round(2) }}</li>
+                {% endfor %}
+            </ul>
+        </p>
+    </div>
+</div>
+{% endfor %}
+{{ pager(page, {'season_id': season.id}, {'season_id': season.id}) }}
+<div class="text-center">
+    <a href="{{ url_for('season_standings', season_id=season.id) }}" class="btn btn-secondary">Standings</a>
+</div>
+{% endblock %}
+'''
+
+# Create a template dictionary
+template_dict = {
+    'base.html': base_template,
+    'pagination.html': pagination_template,
+    'login.html': login_template,
+    'signup.html': signup_template,
+    'index.html': index_template,
+    'dashboard.html': dashboard_template,
+    'leaderboard.html': leaderboard_template,
+    'leaderboard_table.html': leaderboard_table_template,
+    'my_games.html': my_games_template,
+    'admin_dashboard.html': admin_dashboard_template,
+    'matchmaking.html': matchmaking_template,
+    'player_profile.html': player_profile_template,
+    'seasons.html': seasons_template,
+    'season_standings.html': season_standings_template,
+    'season_games.html': season_games_template,
+}
+
+# Set up the DictLoader
+app.jinja_loader = DictLoader(template_dict)
+
+if __name__ == '__main__':
+    with app.app_context():
+        create_tables()
+        rank_index.load(ratings_version())
+    # With the debug reloader only the serving child process runs the worker
+    if app.config['RATING_PROCESSING'] == 'queue' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_rating_worker()
+    app.run(debug=True)
@@ -0,0 +1,111 @@
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# The app binds its engine at import time, so the test database has to be
+# chosen before barazeliya_ranking is imported
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DATABASE_PATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import barazeliya_ranking as ranking
+
+
+# Size of the shared synthetic league used by the scale tests; set
+# LEAGUE_GAMES in the environment for a bigger one
+LEAGUE_PLAYERS = int(os.environ.get('LEAGUE_PLAYERS', 500))
+LEAGUE_GAMES = int(os.environ.get('LEAGUE_GAMES', 50000))
+LEAGUE_SEED = 8
+
+
+# The in-process caches are keyed on counters that restart with every
+# database, so each test starts with empty ones
+def reset_caches():
+    ranking.leaderboard_cache = ranking.LeaderboardCache()
+    ranking.player_search = ranking.PlayerSearchIndex()
+    ranking.rank_index = ranking.RankIndex()
+    ranking.user_cache = ranking.UserCache()
+
+
+# A fresh database per test, with the admin user and nothing else
+@pytest.fixture
+def app():
+    with ranking.app.app_context():
+        ranking.db.drop_all()
+        ranking.create_tables(demo=False)
+        reset_caches()
+        yield ranking.app
+        ranking.db.session.remove()
+
+
+# The league is generated once per session and copied aside; each test
+# gets its own copy of the file, so tests may write to it
+@pytest.fixture(scope='session')
+def league_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp('league') / 'league.db'
+    with ranking.app.app_context():
+        ranking.db.drop_all()
+        ranking.create_tables(demo=False)
+        ranking.generate_league(players=LEAGUE_PLAYERS, games=LEAGUE_GAMES, seed=LEAGUE_SEED)
+        ranking.db.session.remove()
+        ranking.db.engine.dispose()
+    shutil.copyfile(DATABASE_PATH, path)
+    return path
+
+
+# A deterministic league of LEAGUE_PLAYERS players and LEAGUE_GAMES rated
+# games, for performance tests
+@pytest.fixture
+def league(league_file):
+    with ranking.app.app_context():
+        ranking.db.engine.dispose()
+        shutil.copyfile(league_file, DATABASE_PATH)
+        reset_caches()
+        yield ranking.app
+        ranking.db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+
+# Adds a confirmed, not yet processed game between seats (team 1 then
+# team 2) and returns its id
+def add_confirmed_game(seats, winning_team=1, date_submitted=None):
+    game = ranking.Game(
+        team1_player1_id=seats[0], team1_player2_id=seats[1], team2_player1_id=seats[2],
+        team2_player2_id=seats[3], winning_team=winning_team, submitted_by=seats[0],
+        confirmations=4, status='confirmed', date_submitted=date_submitted or datetime.datetime.utcnow())
+    ranking.set_participants(game)
+    ranking.db.session.add(game)
+    ranking.db.session.commit()
+    return game.id
+
+
+# Counts (and keeps) the SQL statements run while the block is open
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(ranking.db.engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(ranking.db.engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, *args):
+        self.count += 1
+        self.statements.append(statement)
@@ -0,0 +1,32 @@
+from conftest import ranking
+
+
+def results(p50_ms, queries=3, ns_per_call=1000.0, samples=50):
+    def timings():
+        return {'p50_ms': p50_ms, 'p90_ms': p50_ms * 3, 'queries': queries, 'samples': samples}
+    return {
+        'rating_math': {'elo_deltas': {'ns_per_call': ns_per_call}},
+        'scales': {'1000': {'routes': {'/dashboard': timings()}, 'process_game': timings()}},
+    }
+
+
+def regressed(current, baseline):
+    return [name for name, _, _ in ranking.compare_benchmarks(current, baseline, 0.25)]
+
+
+def test_small_absolute_noise_is_not_a_regression():
+    assert regressed(results(0.95), results(0.60)) == []
+    assert regressed(results(2.0, ns_per_call=183.0), results(2.0, ns_per_call=142.0)) == []
+
+
+def test_real_slowdowns_and_query_growth_are_regressions():
+    assert regressed(results(5.0), results(2.0)) == ['1000:/dashboard.p50_ms', '1000:process_game.p50_ms']
+    assert regressed(results(2.0, queries=4), results(2.0)) == ['1000:/dashboard.queries', '1000:process_game.queries']
+    assert regressed(results(2.0, ns_per_call=2000.0), results(2.0)) == ['elo_deltas.ns_per_call']
+
+
+def test_tail_latency_is_compared_only_with_enough_samples():
+    assert regressed(results(2.0), results(2.0, samples=50)) == []
+    current = results(2.0, samples=500)
+    current['scales']['1000']['routes']['/dashboard']['p90_ms'] = 20.0
+    assert regressed(current, results(2.0, samples=500)) == ['1000:/dashboard.p90_ms']
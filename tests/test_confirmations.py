@@ -0,0 +1,49 @@
+import threading
+
+from sqlalchemy import func, select
+
+from conftest import log_in, ranking
+
+
+def submit_game(client, submitter_id):
+    log_in(client, submitter_id)
+    client.post('/dashboard', data={
+        'player1': 'player1', 'player2': 'player2', 'player3': 'player3', 'player4': 'player4', 'winning_team': '1',
+    })
+    return ranking.db.session.execute(select(func.max(ranking.Game.id))).scalar()
+
+
+def count(model, game_id):
+    return ranking.db.session.execute(select(func.count()).where(model.game_id == game_id)).scalar()
+
+
+# Nine requests confirm the same game at once: every player twice
+# (including the submitter, whose submission already counted) plus one
+# more click from the submitter
+def test_concurrent_confirmations_are_counted_once(app, client):
+    ranking.create_synthetic_players(4)
+    player_ids = [player.id for player in ranking.Player.query.order_by(ranking.Player.id)]
+    for _ in range(5):
+        game_id = submit_game(client, player_ids[0])
+        ranking.db.session.remove()
+        clickers = player_ids * 2 + player_ids[:1]
+        barrier = threading.Barrier(len(clickers))
+        statuses = []
+
+        def confirm(user_id):
+            thread_client = app.test_client()
+            log_in(thread_client, user_id)
+            barrier.wait()
+            statuses.append(thread_client.get(f'/confirm_game/{game_id}').status_code)
+
+        threads = [threading.Thread(target=confirm, args=(user_id,)) for user_id in clickers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert statuses == [302] * len(clickers)
+        game = ranking.db.session.get(ranking.Game, game_id)
+        assert (game.confirmations, game.status, game.processed) == (3, 'confirmed', True)
+        assert count(ranking.GameConfirmation, game_id) == 3
+        assert count(ranking.EloChange, game_id) == 4
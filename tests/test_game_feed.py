@@ -0,0 +1,28 @@
+from sqlalchemy import func, select
+
+from conftest import QueryCounter, log_in, ranking
+
+
+def queries_for(client, path):
+    client.get(path)  # warm the per-process caches first
+    with QueryCounter() as counter:
+        assert client.get(path).status_code == 200
+    return counter.count
+
+
+def test_game_feed_query_count_is_constant(app, client):
+    ranking.generate_league(players=8, games=10, seed=1)
+    busiest = ranking.db.session.execute(
+        select(ranking.GameParticipant.user_id)
+        .group_by(ranking.GameParticipant.user_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+
+    def counts():
+        log_in(client, busiest)
+        my_games = queries_for(client, '/my_games')
+        log_in(client, 1)
+        return my_games, queries_for(client, '/admin_dashboard')
+
+    small = counts()
+    ranking.simulate_games(300, seed=2)
+    assert counts() == small
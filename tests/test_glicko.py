@@ -0,0 +1,51 @@
+import datetime
+
+import pytest
+
+from conftest import add_confirmed_game, ranking
+
+
+# Confirms and processes a game; returns how many ratings it changed
+def add_game(player_ids, date_submitted):
+    game_id = add_confirmed_game(player_ids, date_submitted=date_submitted)
+    ranking.process_game(game_id)
+    return ranking.EloChange.query.filter_by(game_id=game_id).count()
+
+
+def test_periods_are_closed_only_when_there_is_something_to_rate(app, monkeypatch):
+    monkeypatch.setitem(ranking.app.config, 'RATING_ENGINE', 'glicko2')
+    engine = ranking.rating_engine()
+    closes = []
+    close_periods = ranking.Glicko2Engine.close_periods
+    monkeypatch.setattr(ranking.Glicko2Engine, 'close_periods', lambda self: closes.append(1) or close_periods(self))
+    ranking.create_synthetic_players(4)
+    player_ids = [player.id for player in ranking.Player.query]
+    period = ranking.app.config['RATING_PERIOD']
+
+    # A game from a finished period is rated as soon as it is confirmed
+    assert add_game(player_ids, engine.cutoff() - period) == 4
+    assert len(closes) == 1
+    # Games in the open period wait, without searching for unrated games
+    assert add_game(player_ids, engine.cutoff()) == 0
+    assert add_game(player_ids, engine.cutoff()) == 0
+    assert len(closes) == 1
+
+    # Once the period rolls over, the next confirmation rates the waiting games
+    cutoff = engine.cutoff() + period
+    monkeypatch.setattr(ranking.Glicko2Engine, 'cutoff', lambda self: cutoff)
+    assert add_game(player_ids, cutoff) == 0
+    assert len(closes) == 2
+    assert ranking.EloChange.query.count() == 12
+
+
+def test_late_confirmations_match_a_replay(app, monkeypatch):
+    monkeypatch.setitem(ranking.app.config, 'RATING_ENGINE', 'glicko2')
+    ranking.create_synthetic_players(6)
+    player_ids = [player.id for player in ranking.Player.query.order_by(ranking.Player.id)]
+    week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
+    add_game(player_ids[:4], week_ago)
+    # Confirmed after its period was rated
+    assert add_game(player_ids[2:], week_ago + datetime.timedelta(minutes=1)) == 4
+    live = {player.id: player.rating for player in ranking.Player.query}
+    ranking.rebuild_ratings()
+    assert {player.id: player.rating for player in ranking.Player.query} == pytest.approx(live, abs=1e-9)
@@ -0,0 +1,70 @@
+import datetime
+import io
+
+import pytest
+
+from conftest import log_in, ranking
+
+FIRST = b'team1_player1,team1_player2,team2_player1,team2_player2,winning_team\n' + \
+    b'player1,player2,player3,player4,1\n' * 3
+SECOND = b'team1_player1,team1_player2,team2_player1,team2_player2,winning_team\n' + \
+    b'player5,player6,player7,player8,2\n' * 2
+
+
+def upload(client, content, filename='results.csv'):
+    return client.post('/import_games', data={'file': (io.BytesIO(content), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_files_with_the_same_name_are_separate_imports(app, client):
+    ranking.create_synthetic_players(8)
+    log_in(client, 1)
+    upload(client, FIRST)
+    upload(client, SECOND)
+    assert ranking.Game.query.count() == 5
+    assert ranking.ImportJob.query.count() == 0
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_interrupted_import_resumes_after_last_batch(app):
+    ranking.create_synthetic_players(8)
+    job_name = ranking.import_job_name('results.csv', io.BytesIO(FIRST))
+
+    def interrupt(result):
+        raise Interrupted
+
+    with pytest.raises(Interrupted):
+        ranking.import_games(ranking.read_game_records(io.StringIO(FIRST.decode()), 'csv'), job_name, 1,
+                             batch_size=2, progress=interrupt)
+    assert ranking.Game.query.count() == 2
+    result = ranking.import_games(ranking.read_game_records(io.StringIO(FIRST.decode()), 'csv'), job_name, 1,
+                                  batch_size=2)
+    assert (result.imported, result.rows_done) == (1, 3)
+    assert ranking.Game.query.count() == 3
+    assert ranking.ImportJob.query.count() == 0
+
+
+def test_back_dated_import_matches_a_replay(app):
+    ranking.create_synthetic_players(8)
+    ranking.simulate_games(40, seed=3)
+    rows = ''.join(f'player{1 + i % 8},player{1 + (i + 1) % 8},player{1 + (i + 2) % 8},player{1 + (i + 3) % 8},'
+                   f'{1 + i % 2},2020-01-01T00:{i:02d}:00\n' for i in range(40))
+    content = 'team1_player1,team1_player2,team2_player1,team2_player2,winning_team,date_submitted\n' + rows
+    ranking.import_games(ranking.read_game_records(io.StringIO(content), 'csv'), 'old.csv', 1)
+    live = {player.id: player.rating for player in ranking.Player.query}
+    ranking.rebuild_ratings()
+    assert {player.id: player.rating for player in ranking.Player.query} == pytest.approx(live, abs=1e-9)
+
+
+def test_uploads_skip_non_objects_and_store_offset_dates_as_utc(app, client):
+    ranking.create_synthetic_players(4)
+    log_in(client, 1)
+    content = b'[1, 2]\n"player1"\n' + \
+        b'{"team1_player1": "player1", "team1_player2": "player2", "team2_player1": "player3", ' \
+        b'"team2_player2": "player4", "winning_team": 1, "date_submitted": "2024-01-01T02:00:00+02:00"}\n'
+    assert upload(client, content, 'results.jsonl').status_code == 302
+    assert [game.date_submitted for game in ranking.Game.query] == [datetime.datetime(2024, 1, 1)]
+    assert ranking.ImportJob.query.count() == 0
@@ -0,0 +1,27 @@
+from sqlalchemy import select
+
+from conftest import QueryCounter, ranking
+
+
+def test_sparklines_are_rendered_with_the_page(app, client):
+    ranking.generate_league(players=60, games=400, seed=3)
+    with QueryCounter() as counter:
+        html = client.get('/leaderboard').get_data(as_text=True)
+    # ratings version, ranked rows and one statement for every sparkline
+    assert counter.count == 3
+    rows, _ = ranking.leaderboard_cache.load(ranking.ratings_version())
+    page_ids = [row.id for row in rows[:ranking.app.config['PAGE_SIZE']]]
+    drawn = [values for values in ranking.recent_ratings(page_ids).values() if len(values) > 1]
+    assert html.count('<polyline') == len(drawn) > 40
+
+
+def test_recent_ratings_are_each_players_last_games(app):
+    ranking.generate_league(players=10, games=200, seed=4)
+    player_ids = [player.id for player in ranking.Player.query]
+    recent = ranking.recent_ratings(player_ids)
+    for player_id in player_ids:
+        history = ranking.db.session.execute(
+            select(ranking.RatingSnapshot.rating_after).where(ranking.RatingSnapshot.player_id == player_id)
+            .order_by(ranking.RatingSnapshot.ts, ranking.RatingSnapshot.game_id)
+        ).scalars().all()
+        assert recent[player_id] == history[-ranking.app.config['SPARKLINE_GAMES']:]
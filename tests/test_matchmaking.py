@@ -0,0 +1,12 @@
+from conftest import log_in, ranking
+
+
+def test_non_numeric_players_are_ignored(app, client):
+    ranking.create_synthetic_players(4)
+    player_ids = [player.id for player in ranking.Player.query]
+    log_in(client, player_ids[0])
+    response = client.post('/matchmaking', data={'present': [*map(str, player_ids[:3]), 'x']})
+    assert response.status_code == 200
+    assert b'Select at least four players.' in response.data
+    response = client.post('/matchmaking', data={'present': [*map(str, player_ids), 'x']})
+    assert response.status_code == 200
@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from conftest import add_confirmed_game, ranking
+
+
+def metric(line_prefix):
+    for line in ranking.metrics.render().splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.split()[-1])
+    return 0.0
+
+
+def test_rating_engine_apply_is_timed(app):
+    ranking.create_synthetic_players(4)
+    player_ids = [player.id for player in ranking.Player.query]
+    game_id = add_confirmed_game(player_ids)
+    count = 'function_duration_seconds_count{function="EloEngine.apply"}'
+    before = metric(count)
+    ranking.process_game(game_id)
+    assert metric(count) == before + 1
+
+
+def test_failed_statements_leave_no_timer_state(app):
+    with ranking.db.engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql('SELECT * FROM no_such_table')
+        connection.exec_driver_sql('SELECT 1')
+        assert isinstance(connection.info['query_started'], float)
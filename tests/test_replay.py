@@ -0,0 +1,48 @@
+import datetime
+import random
+
+import pytest
+from sqlalchemy import select
+
+from conftest import add_confirmed_game, ranking
+
+
+def stored_ratings():
+    players = {player.id: (player.rating, player.games_played) for player in ranking.Player.query}
+    changes = {
+        (game_id, player_id): change for game_id, player_id, change in ranking.db.session.execute(
+            select(ranking.EloChange.game_id, ranking.EloChange.player_id, ranking.EloChange.elo_change))
+    }
+    return players, changes
+
+
+def test_rebuild_matches_per_game_processing(app):
+    ranking.create_synthetic_players(12)
+    player_ids = [player.id for player in ranking.Player.query]
+    rng = random.Random(5)
+    start = datetime.datetime(2024, 1, 1)
+    for index in range(150):
+        game_id = add_confirmed_game(rng.sample(player_ids, 4), rng.choice([1, 2]),
+                                     start + datetime.timedelta(minutes=index))
+        ranking.process_game(game_id)
+
+    players, changes = stored_ratings()
+    assert ranking.rebuild_ratings() == 150
+    rebuilt_players, rebuilt_changes = stored_ratings()
+
+    assert rebuilt_players.keys() == players.keys()
+    for player_id, (rating, games_played) in players.items():
+        assert rebuilt_players[player_id][0] == pytest.approx(rating, abs=1e-9)
+        assert rebuilt_players[player_id][1] == games_played
+    assert rebuilt_changes.keys() == changes.keys()
+    for key, change in changes.items():
+        assert rebuilt_changes[key] == pytest.approx(change, abs=1e-9)
+
+
+def test_scalar_and_array_elo_agree():
+    rng = random.Random(3)
+    ratings = [[rng.uniform(1000, 2700) for _ in range(4)] for _ in range(200)]
+    winners = [rng.choice([1, 2]) for _ in ratings]
+    _, deltas = ranking.elo_kernel(ratings, winners)
+    for row, winner, expected in zip(ratings, winners, deltas.tolist()):
+        assert ranking.elo_deltas(row, winner) == pytest.approx(expected, abs=1e-9)
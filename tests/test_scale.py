@@ -0,0 +1,27 @@
+import numpy as np
+from sqlalchemy import select
+
+from conftest import LEAGUE_GAMES, LEAGUE_PLAYERS, QueryCounter, ranking
+
+
+def test_league_fixture_looks_like_a_league(league):
+    assert ranking.Game.query.count() == LEAGUE_GAMES
+    assert ranking.Player.query.count() == LEAGUE_PLAYERS
+    ratings = np.array(ranking.db.session.execute(select(ranking.Player.rating)).scalars().all())
+    assert 1450 < ratings.mean() < 1550
+    assert 30 < ratings.std() < 300
+
+
+def test_rebuild_and_stats_agree_at_scale(league):
+    ratings = dict(ranking.db.session.execute(select(ranking.Player.id, ranking.Player.rating)).all())
+    ranking.rebuild_ratings()
+    for player_id, rating in ranking.db.session.execute(select(ranking.Player.id, ranking.Player.rating)):
+        assert abs(rating - ratings[player_id]) < 1e-6
+    assert ranking.check_stats() == {'players': [], 'pairs': []}
+
+
+def test_leaderboard_warm_hit_is_one_query(league, client):
+    assert client.get('/leaderboard').status_code == 200
+    with QueryCounter() as counter:
+        assert client.get('/leaderboard').status_code == 200
+    assert counter.count == 1
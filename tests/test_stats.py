@@ -0,0 +1,34 @@
+import datetime
+
+from conftest import QueryCounter, add_confirmed_game, ranking
+
+
+def test_streaks_follow_date_order_when_confirmed_out_of_order(app):
+    ranking.create_synthetic_players(5)
+    p = [player.id for player in ranking.Player.query.order_by(ranking.Player.id)]
+    start = datetime.datetime(2024, 1, 1)
+    earlier = add_confirmed_game([p[0], p[1], p[2], p[3]], 1, start)
+    later = add_confirmed_game([p[2], p[1], p[0], p[4]], 1, start + datetime.timedelta(hours=1))
+    ranking.process_game(later)
+    ranking.process_game(earlier)
+    assert ranking.check_stats() == {'players': [], 'pairs': []}
+
+
+def test_streaks_follow_date_order_within_a_batch(app):
+    ranking.create_synthetic_players(5)
+    p = [player.id for player in ranking.Player.query.order_by(ranking.Player.id)]
+    start = datetime.datetime(2024, 1, 1)
+    earlier = add_confirmed_game([p[0], p[1], p[2], p[3]], 2, start)
+    later = add_confirmed_game([p[4], p[1], p[0], p[2]], 1, start + datetime.timedelta(hours=1))
+    ranking.process_games([later, earlier])
+    assert ranking.check_stats() == {'players': [], 'pairs': []}
+
+
+def test_processing_reads_the_game_row_once(app):
+    ranking.create_synthetic_players(4)
+    p = [player.id for player in ranking.Player.query.order_by(ranking.Player.id)]
+    game_id = add_confirmed_game(p, 1, datetime.datetime(2024, 1, 1))
+    with QueryCounter() as counter:
+        ranking.process_game(game_id)
+    # The claiming UPDATE returns the row; nothing selects it again
+    assert not [statement for statement in counter.statements if statement.startswith('SELECT game.')]
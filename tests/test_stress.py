@@ -0,0 +1,12 @@
+from conftest import ranking
+
+
+def test_stress_worker_counts_only_confirmed_games(app):
+    ranking.create_synthetic_players(10)
+    ranking.db.session.commit()
+    results = ranking.stress_worker(0, threads=2, seconds=1, seed=1)
+    ranking.db.session.remove()
+    confirmed = ranking.Game.query.filter_by(status='confirmed', processed=True).count()
+    assert results['errors'] == 0
+    assert results['games'] == confirmed > 0
+    assert results['requests'] == 3 * ranking.Game.query.count()
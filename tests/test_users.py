@@ -0,0 +1,50 @@
+from flask import session
+
+from conftest import QueryCounter, log_in, ranking
+
+
+# Deletes the user the way another worker's delete_user would: in the
+# database only, leaving this process's cache alone
+def delete_elsewhere(user_id):
+    ranking.db.session.delete(ranking.db.session.get(ranking.Player, user_id))
+    ranking.db.session.delete(ranking.db.session.get(ranking.User, user_id))
+    ranking.bump_players_version()
+    ranking.db.session.commit()
+
+
+def queries_to_load(user_id):
+    with ranking.app.test_request_context():
+        session['user_id'] = user_id
+        with QueryCounter() as counter:
+            ranking.current_user()
+    return counter.count
+
+
+def test_cached_users_cost_no_query(app):
+    ranking.create_synthetic_players(1)
+    user_id = ranking.db.session.execute(ranking.select(ranking.Player.id)).scalar()
+    assert queries_to_load(user_id) == 2
+    assert queries_to_load(user_id) == 0
+
+
+def test_deleted_user_loses_access_in_every_worker(app, client):
+    ranking.create_synthetic_players(1)
+    user_id = ranking.db.session.execute(ranking.select(ranking.Player.id)).scalar()
+    log_in(client, user_id)
+    assert client.get('/').status_code == 200
+
+    delete_elsewhere(user_id)
+    # Once the cache window is over the version has moved and the user is gone
+    ranking.user_cache.expires = 0.0
+    response = client.get('/')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/login')
+
+
+def test_synthetic_players_continue_after_the_highest_number(app):
+    ranking.create_synthetic_players(3)
+    first = ranking.User.query.filter_by(username='player1').one()
+    delete_elsewhere(first.id)
+    ranking.create_synthetic_players(1)
+    assert sorted(user.username for user in ranking.User.query.filter(ranking.User.username.like('player%'))) == \
+        ['player2', 'player3', 'player4']